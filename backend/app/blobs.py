@@ -0,0 +1,94 @@
+"""
+Content-addressed blob storage for uploaded documents.
+
+Uploads are stored once under their sha256 and linked into each case
+directory (see ``app.uploads``). Keeping the blobs behind ``BlobStore`` lets
+several API workers or nodes share them: the job worker that analyzes a
+case may not be the process, or even the machine, that received the upload,
+so it asks the store for a local path to each document by its hash.
+
+``LocalBlobStore`` keeps blobs in a directory. For several nodes, point
+``BLOB_STORE_PATH`` (and ``UPLOAD_DIR``) at a shared mount. Other backends
+(object storage) implement the same four methods, with ``local_path``
+downloading into a local cache.
+
+Configuration (environment):
+    BLOB_STORE       backend name (default ``local``)
+    BLOB_STORE_PATH  blob directory (default ``<UPLOAD_DIR>/.blobs``)
+"""
+import os
+import uuid
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BlobStore:
+    """Interface shared by blob store backends. Blobs are immutable and keyed by sha256."""
+
+    def staging_path(self) -> str:
+        """A fresh temporary path to stream an upload into before ``put``."""
+        raise NotImplementedError
+
+    def put(self, tmp_path: str, sha256: str) -> None:
+        """Move the fully written ``tmp_path`` into the store. A no-op if the content is already stored."""
+        raise NotImplementedError
+
+    def exists(self, sha256: str) -> bool:
+        raise NotImplementedError
+
+    def local_path(self, sha256: str) -> str:
+        """Path of the blob on this machine. Raises ``FileNotFoundError`` if it isn't stored."""
+        raise NotImplementedError
+
+    def delete(self, sha256: str) -> bool:
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs as files named by their hash in one directory, written with atomic renames."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, sha256: str) -> str:
+        if not sha256 or not all(c in "0123456789abcdef" for c in sha256):
+            raise ValueError(f"Invalid blob key: {sha256!r}")
+        return os.path.join(self.root, sha256)
+
+    def staging_path(self) -> str:
+        # Same directory as the blobs, so ``put`` is a rename on one filesystem.
+        return os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+
+    def put(self, tmp_path: str, sha256: str) -> None:
+        blob_path = self._path(sha256)
+        if os.path.exists(blob_path):
+            os.remove(tmp_path)  # Content already stored
+        else:
+            os.replace(tmp_path, blob_path)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self._path(sha256))
+
+    def local_path(self, sha256: str) -> str:
+        path = self._path(sha256)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Blob {sha256} not found in {self.root}")
+        return path
+
+    def delete(self, sha256: str) -> bool:
+        try:
+            os.remove(self._path(sha256))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+def get_blob_store(default_root: str = os.path.join("uploads", ".blobs"), backend: Optional[str] = None) -> BlobStore:
+    """Build the blob store selected by ``BLOB_STORE``."""
+    backend = (backend or os.getenv("BLOB_STORE", "local")).lower()
+    if backend == "local":
+        return LocalBlobStore(os.getenv("BLOB_STORE_PATH", default_root))
+    raise ValueError(f"Unknown blob store backend: {backend}")
@@ -0,0 +1,108 @@
+"""
+Client side of the crew runner.
+
+When ``CREW_POOL_ADDRESS`` is set, cases are sent to the persistent worker
+pool started with ``uv run crew_pool`` in ``kycagents/``. Otherwise (or when
+the pool is unreachable) the crew is started as a one-off
+``uv run run_crew <file>`` subprocess.
+
+A pool run that has not answered within ``CREW_POOL_TIMEOUT`` seconds
+(default 1800) raises ``TimeoutError`` rather than falling back, so the job
+fails and the job queue retries it.
+"""
+import os
+import json
+import logging
+import tempfile
+import subprocess
+from multiprocessing.connection import Client
+from typing import Any, Dict, Optional, Tuple
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+KYC_AGENTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "kycagents"))
+# Absolute, since the crew runs with kycagents/ as its working directory
+EVENTS_DB = os.path.abspath(os.getenv("KYC_EVENTS_DB", "kyc_events.db"))
+CREW_POOL_TIMEOUT = float(os.getenv("CREW_POOL_TIMEOUT", "1800"))
+
+
+def _pool_address() -> Tuple[str, int]:
+    host, _, port = os.environ["CREW_POOL_ADDRESS"].rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def run_crew_in_pool(file_path: str, case_id: Optional[str] = None) -> Dict[str, Any]:
+    authkey = os.getenv("CREW_POOL_AUTHKEY")
+    if not authkey:
+        raise ConnectionError("CREW_POOL_AUTHKEY is not set")
+    with Client(_pool_address(), authkey=authkey.encode("utf-8")) as conn:
+        conn.send({"file_path": file_path, "case_id": case_id, "events_db": EVENTS_DB})
+        if not conn.poll(CREW_POOL_TIMEOUT):
+            raise TimeoutError(f"Crew pool gave no result for {file_path} within {CREW_POOL_TIMEOUT:.0f}s")
+        return conn.recv()
+
+
+def run_crew_subprocess(file_path: str, case_id: Optional[str] = None) -> Dict[str, Any]:
+    # Force UTF-8 encoding for Windows specifically to handle emojis in CrewAI output
+    env = os.environ.copy()
+    env["PYTHONUTF8"] = "1"
+    # Lets the OCR tool publish per-page progress events for this case
+    if case_id:
+        env["KYC_CASE_ID"] = case_id
+        env["KYC_EVENTS_DB"] = EVENTS_DB
+    # run_crew writes the typed extraction here, separate from the verbose stdout
+    fd, result_file = tempfile.mkstemp(prefix="kyc-result-", suffix=".json")
+    os.close(fd)
+    env["KYC_RESULT_FILE"] = result_file
+
+    try:
+        process = subprocess.Popen(
+            ["uv", "run", "run_crew", file_path],
+            cwd=KYC_AGENTS_DIR,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            env=env
+        )
+        stdout, stderr = process.communicate()
+        envelope = {}
+        if process.returncode == 0 and os.path.getsize(result_file):
+            with open(result_file, "r", encoding="utf-8") as f:
+                envelope = json.load(f)
+    finally:
+        os.remove(result_file)
+    return {
+        "returncode": process.returncode,
+        "stdout": stdout,
+        "stderr": stderr,
+        "extraction": envelope.get("extraction"),
+        "telemetry": envelope.get("telemetry", []),
+    }
+
+
+def run_crew(file_path: str, case_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run the KYC crew on one file. Blocking. Returns a dict with ``returncode``,
+    ``stdout``, ``stderr`` and ``extraction`` (the typed ExtractedDocument as a
+    dict, or None). Stage timings reported by the crew are merged into the
+    API's metrics.
+    """
+    result = None
+    if os.getenv("CREW_POOL_ADDRESS"):
+        try:
+            with metrics.span("crew_run", mode="pool"):
+                result = run_crew_in_pool(file_path, case_id)
+        except TimeoutError:
+            # The pool may still be running it; let the job retry rather than run it twice now.
+            raise
+        except (ConnectionError, EOFError, OSError) as e:
+            logger.warning(f"Crew pool unavailable ({e}), falling back to subprocess")
+    if result is None:
+        with metrics.span("crew_run", mode="subprocess"):
+            result = run_crew_subprocess(file_path, case_id)
+    metrics.ingest(result.pop("telemetry", None))
+    metrics.CREW_RUNS.inc(outcome="ok" if result["returncode"] == 0 else "error")
+    return result
@@ -0,0 +1,40 @@
+"""
+Optional compressed side storage for raw crew output.
+
+Case records keep only the typed extraction. The verbose agent stdout/stderr
+is gzip-compressed to ``CREW_LOG_DIR/<case_id>/`` for debugging and audits,
+or dropped entirely when ``CREW_RAW_LOGS=0``.
+"""
+import os
+import gzip
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+CREW_LOG_DIR = os.getenv("CREW_LOG_DIR", "crew_logs")
+
+
+def raw_logs_enabled() -> bool:
+    return os.getenv("CREW_RAW_LOGS", "1").lower() not in ("0", "false", "no")
+
+
+def save_raw_log(case_id: str, name: str, text: str) -> Optional[str]:
+    """Compress ``text`` to the case's log directory. Returns the path, or None if disabled/empty."""
+    if not text or not raw_logs_enabled():
+        return None
+    case_dir = os.path.join(CREW_LOG_DIR, case_id)
+    os.makedirs(case_dir, exist_ok=True)
+    path = os.path.join(case_dir, f"{name}.log.gz")
+    try:
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(text)
+    except OSError as e:
+        logger.error(f"Error saving crew log for {case_id}: {e}")
+        return None
+    return os.path.abspath(path)
+
+
+def load_raw_log(path: str) -> str:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return f.read()
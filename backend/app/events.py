@@ -0,0 +1,119 @@
+"""
+Per-case progress events.
+
+Status transitions (published by the API) and per-page OCR progress
+(published from the crew process by ``kycagents.progress``) are appended to a
+small SQLite table shared by both. ``GET /kyc/events/{case_id}`` streams them
+as server-sent events; each event's id is its row id, so a client that
+reconnects with ``Last-Event-ID`` resumes exactly where it left off.
+"""
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+# Kept in sync with kycagents/src/kycagents/progress.py
+EVENTS_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS case_events ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " case_id TEXT NOT NULL,"
+    " type TEXT NOT NULL,"
+    " data TEXT NOT NULL,"
+    " created_at REAL NOT NULL"
+    ")"
+)
+
+TERMINAL_STATUSES = {"completed", "failed"}
+
+
+class EventLog:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._waiters: List[asyncio.Event] = []
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(EVENTS_SCHEMA)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_case_events_case ON case_events (case_id, id)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def publish(self, case_id: str, event_type: str, data: Dict[str, Any]) -> int:
+        cur = self._conn().execute(
+            "INSERT INTO case_events (case_id, type, data, created_at) VALUES (?, ?, ?, ?)",
+            (case_id, event_type, json.dumps(data), time.time()),
+        )
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass  # Published off the event loop thread; streams pick it up by polling.
+        else:
+            for waiter in list(self._waiters):
+                waiter.set()
+        return cur.lastrowid
+
+    def read(self, case_id: str, after_id: int = 0, limit: int = 500) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT id, type, data FROM case_events WHERE case_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (case_id, after_id, limit),
+        ).fetchall()
+        return [{"id": row[0], "type": row[1], "data": json.loads(row[2])} for row in rows]
+
+    def prune(self, max_age_seconds: float) -> int:
+        cur = self._conn().execute("DELETE FROM case_events WHERE created_at < ?", (time.time() - max_age_seconds,))
+        return cur.rowcount
+
+    async def stream(
+        self,
+        case_id: str,
+        after_id: int = 0,
+        done: Optional[Callable[[], bool]] = None,
+        poll_interval: float = 0.5,
+        keepalive: float = 15.0,
+    ) -> AsyncIterator[str]:
+        """
+        Yield SSE frames for ``case_id`` after ``after_id`` until all events
+        are sent and ``done()`` reports the case finished. Events from this process wake the stream
+        immediately; events from the crew process are picked up by polling
+        an indexed query.
+        """
+        waiter = asyncio.Event()
+        self._waiters.append(waiter)
+        idle = 0.0
+        try:
+            while True:
+                waiter.clear()
+                events = self.read(case_id, after_id)
+                for event in events:
+                    after_id = event["id"]
+                    yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+                if events:
+                    idle = 0.0
+                    continue
+                if done is not None and done():
+                    # Drain anything published between the read and the check.
+                    for event in self.read(case_id, after_id):
+                        yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+                    return
+                try:
+                    await asyncio.wait_for(waiter.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    idle += poll_interval
+                    if idle >= keepalive:
+                        idle = 0.0
+                        yield ": keep-alive\n\n"
+        finally:
+            self._waiters.remove(waiter)
+
+
+def get_event_log(path: Optional[str] = None) -> EventLog:
+    return EventLog(path or os.getenv("KYC_EVENTS_DB", "kyc_events.db"))
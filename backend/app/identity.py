@@ -0,0 +1,205 @@
+"""
+Case IDs and duplicate-applicant detection.
+
+Case IDs used to be ``KYC-{date}-{abs(hash(full_name)) % 10000}``. Python's
+string hash is salted per process, so each worker gave the same name a
+different ID, and 10,000 buckets a day made unrelated applicants collide and
+overwrite each other's cases. ``new_case_id`` keeps the date prefix and adds
+64 random bits, which needs no coordination between workers or processes.
+
+The identity index maps normalized identity keys to the cases that carry them:
+
+- ``name_dob``: normalized full name plus date of birth
+- ``email``: lower-cased address
+- ``phone``: last 10 digits
+- ``document``: issuing nationality plus document number extracted by the agents
+- ``doc``: sha256 of an uploaded file
+
+A new submission's keys are looked up with indexed, bounded queries, so the
+possible duplicates of a case are found without scanning the store. At most
+``IDENTITY_MAX_MATCHES`` (default 20) cases are read per key and reported
+per case. The
+index lives in a small SQLite table (``IDENTITY_INDEX_PATH``, default
+``kyc_identity.db``) shared by all API processes. ``python -m app.identity
+rebuild`` re-indexes an existing store.
+"""
+import os
+import re
+import uuid
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.screening import normalize_name
+from app.store import CaseStore
+
+logger = logging.getLogger(__name__)
+
+
+def new_case_id(prefix: str = "KYC") -> str:
+    return f"{prefix}-{datetime.utcnow().strftime('%Y%m%d')}-{uuid.uuid4().hex[:16].upper()}"
+
+
+def identity_keys(case: Dict[str, Any]) -> List[str]:
+    """Normalized ``kind:value`` identity keys of a case."""
+    customer = case.get("customer_data") or {}
+    keys = []
+    name = normalize_name(customer.get("full_name") or "")
+    dob = (customer.get("date_of_birth") or "").strip()[:10]
+    if name and dob:
+        keys.append(f"name_dob:{name}|{dob}")
+    email = (customer.get("email") or "").strip().lower()
+    if "@" in email:
+        keys.append(f"email:{email}")
+    phone = re.sub(r"\D", "", customer.get("phone") or "")
+    if len(phone) >= 7:
+        keys.append(f"phone:{phone[-10:]}")
+    extracted = customer.get("extracted") or {}
+    number = re.sub(r"[^0-9A-Z]", "", str(extracted.get("id") or "").upper())
+    if number:
+        keys.append(f"document:{(extracted.get('nationality') or '').upper()}|{number}")
+    for document in case.get("documents") or []:
+        if document.get("sha256"):
+            keys.append(f"doc:{document['sha256']}")
+    return sorted(set(keys))
+
+
+class IdentityIndex:
+    def __init__(self, path: str, max_matches: int = 20):
+        self.path = path
+        # Cap on the cases returned per lookup, so a widely shared key (a
+        # common document template, a shared office phone) costs the same
+        # however many cases carry it.
+        self.max_matches = max_matches
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS identity_keys ("
+            " key TEXT NOT NULL,"
+            " case_id TEXT NOT NULL,"
+            " PRIMARY KEY (key, case_id)"
+            ") WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_identity_case ON identity_keys (case_id)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def index(self, case_id: str, keys: Iterable[str]) -> None:
+        """Replace the keys recorded for ``case_id``."""
+        self.index_many({case_id: keys})
+
+    def index_many(self, cases: Dict[str, Iterable[str]]) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for case_id, keys in cases.items():
+                conn.execute("DELETE FROM identity_keys WHERE case_id = ?", (case_id,))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO identity_keys (key, case_id) VALUES (?, ?)",
+                    [(key, case_id) for key in keys],
+                )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def cases_with(self, key: str, limit: Optional[int] = None) -> List[str]:
+        """Cases carrying ``key``, newest case ID first, at most ``limit`` (default ``max_matches``)."""
+        rows = self._conn().execute(
+            "SELECT case_id FROM identity_keys WHERE key = ? ORDER BY case_id DESC LIMIT ?",
+            (key, limit or self.max_matches),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def matches(self, keys: List[str], exclude: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Other cases sharing any of ``keys``, with the kinds of key they share,
+        most shared kinds first, then newest. Reads at most ``max_matches`` cases per key
+        and returns at most ``max_matches`` cases.
+        """
+        shared: Dict[str, set] = {}
+        for key in keys:
+            for case_id in self.cases_with(key, self.max_matches + 1):
+                if case_id != exclude:
+                    shared.setdefault(case_id, set()).add(key.split(":", 1)[0])
+        found = [{"case_id": case_id, "matched_on": sorted(kinds)} for case_id, kinds in shared.items()]
+        return sorted(found, key=lambda m: (len(m["matched_on"]), m["case_id"]), reverse=True)[:self.max_matches]
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM identity_keys")
+
+
+class PendingIdentities:
+    """
+    Identity keys of a batch of new cases that are not written to the index
+    yet (see ``IdentityIndex.index_many``), matched against each other the
+    same way the index matches: one lookup per key, not a scan of the batch.
+    """
+
+    def __init__(self, max_matches: int = 20):
+        self.max_matches = max_matches
+        self.cases: Dict[str, List[str]] = {}
+        self._by_key: Dict[str, List[str]] = {}
+
+    def add(self, case_id: str, keys: List[str]) -> None:
+        self.cases[case_id] = keys
+        for key in keys:
+            self._by_key.setdefault(key, []).append(case_id)
+
+    def matches(self, keys: List[str], exclude: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Cases of the batch sharing any of ``keys``, like ``IdentityIndex.matches``; latest added first."""
+        shared: Dict[str, set] = {}
+        for key in keys:
+            for case_id in self._by_key.get(key, [])[-(self.max_matches + 1):]:
+                if case_id != exclude:
+                    shared.setdefault(case_id, set()).add(key.split(":", 1)[0])
+        found = [{"case_id": case_id, "matched_on": sorted(kinds)} for case_id, kinds in shared.items()]
+        return sorted(found, key=lambda m: len(m["matched_on"]), reverse=True)[:self.max_matches]
+
+
+def get_identity_index(path: Optional[str] = None) -> IdentityIndex:
+    return IdentityIndex(
+        path or os.getenv("IDENTITY_INDEX_PATH", "kyc_identity.db"),
+        max_matches=int(os.getenv("IDENTITY_MAX_MATCHES", "20")),
+    )
+
+
+def rebuild_index(store: CaseStore, index: IdentityIndex, batch_size: int = 10000) -> int:
+    """Re-index every case in ``store``. Returns the number of cases indexed."""
+    index.clear()
+    count = 0
+    batch: Dict[str, List[str]] = {}
+    for case_id, case in store.items():
+        batch[case_id] = identity_keys(case)
+        if len(batch) >= batch_size:
+            index.index_many(batch)
+            count += len(batch)
+            batch = {}
+    index.index_many(batch)
+    return count + len(batch)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from app.store import get_case_store
+
+    parser = argparse.ArgumentParser(description="Identity index maintenance")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    count = rebuild_index(get_case_store(), get_identity_index())
+    print(f"Indexed {count} cases in {time.perf_counter() - started:.2f}s")
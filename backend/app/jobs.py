@@ -0,0 +1,364 @@
+"""
+Durable, priority-aware job queue for KYC analyses.
+
+Jobs live in a SQLite (WAL) table, so queued work survives restarts and can
+be shared by several API processes. Each priority ("urgent", "high",
+"standard") is its own lane; a claim always takes the oldest ready job from
+the highest non-empty lane. Claimed jobs hold a lease (visibility timeout)
+that the worker renews while it runs; a job whose lease expires - because
+its worker crashed or was redeployed - becomes claimable again. Failed jobs
+are retried with jittered exponential backoff up to ``max_attempts``.
+
+Claims are safe across any number of API processes and nodes sharing the
+database: a case has at most one pending or running job (enforced by a
+partial unique index), each claim gets a fresh lease id, and heartbeats,
+completion and failure only apply while the caller still holds that lease.
+A worker that loses its lease to another one stops the analysis instead of
+recording a stale result.
+"""
+import os
+import time
+import uuid
+import random
+import sqlite3
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_LANES = {"urgent": 0, "high": 1, "standard": 2}
+DEFAULT_PRIORITY = "standard"
+
+
+def priority_rank(priority: Optional[str]) -> int:
+    return PRIORITY_LANES.get((priority or DEFAULT_PRIORITY).lower(), PRIORITY_LANES[DEFAULT_PRIORITY])
+
+
+class Job:
+    def __init__(self, row: sqlite3.Row):
+        self.id: str = row["id"]
+        self.case_id: str = row["case_id"]
+        self.priority: int = row["priority"]
+        self.attempts: int = row["attempts"]
+        self.max_attempts: int = row["max_attempts"]
+        self.worker_id: Optional[str] = row["worker_id"]
+        self.lease_id: Optional[str] = row["lease_id"]
+        self.status: str = row["status"]
+        self.last_error: Optional[str] = row["last_error"]
+        # Set when another worker took over the job after this lease expired
+        self.lost = False
+        # When the job became claimable (enqueue time, or end of its retry backoff)
+        self.available_at: float = row["available_at"]
+
+
+class JobQueue:
+    """SQLite-backed job queue with priority lanes, leases and retries."""
+
+    def __init__(
+        self,
+        path: str,
+        visibility_timeout: float = 300.0,
+        max_attempts: int = 3,
+        backoff_base: float = 5.0,
+        backoff_max: float = 300.0,
+    ):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._local = threading.local()
+        self._conn().execute("PRAGMA journal_mode=WAL")
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " case_id TEXT NOT NULL,"
+                " priority INTEGER NOT NULL,"
+                " status TEXT NOT NULL,"  # pending, running, done, dead
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " max_attempts INTEGER NOT NULL,"
+                " available_at REAL NOT NULL,"
+                " lease_until REAL,"
+                " worker_id TEXT,"
+                " last_error TEXT,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL"
+                ")"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, priority, available_at, created_at)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_case ON jobs (case_id, status)")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "lease_id" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN lease_id TEXT")
+            try:
+                conn.execute(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_case ON jobs (case_id)"
+                    " WHERE status IN ('pending', 'running')"
+                )
+            except sqlite3.IntegrityError:
+                logger.warning("Job queue has several active jobs for one case; not enforcing one per case")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def enqueue(self, case_id: str, priority: Optional[str] = None) -> str:
+        """
+        Queue an analysis for ``case_id``. If the case already has a pending or
+        running job, that job's id is returned (raising its priority if needed).
+        """
+        now = time.time()
+        rank = priority_rank(priority)
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id, priority FROM jobs WHERE case_id = ? AND status IN ('pending', 'running')",
+                (case_id,),
+            ).fetchone()
+            if row:
+                if rank < row["priority"]:
+                    conn.execute("UPDATE jobs SET priority = ?, updated_at = ? WHERE id = ?", (rank, now, row["id"]))
+                return row["id"]
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, case_id, priority, status, max_attempts, available_at, created_at, updated_at)"
+                " VALUES (?, ?, ?, 'pending', ?, ?, ?, ?)",
+                (job_id, case_id, rank, self.max_attempts, now, now, now),
+            )
+            return job_id
+
+    def claim(self, worker_id: str) -> Optional[Job]:
+        """
+        Lease the next ready job, including running jobs whose lease has
+        expired. An expired job that has used up its attempts (its runs keep
+        crashing or killing the worker) is marked dead instead and returned
+        with ``status == "dead"``, so the caller can record the failure.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs"
+                " WHERE (status = 'pending' AND available_at <= ?)"
+                "    OR (status = 'running' AND lease_until < ?)"
+                " ORDER BY priority, available_at, created_at LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            if row["status"] == "running" and row["attempts"] >= row["max_attempts"]:
+                error = (
+                    f"Lease expired on attempt {row['attempts']}/{row['max_attempts']}"
+                    f" (worker {row['worker_id']} stopped responding)"
+                )
+                logger.error(f"Job {row['id']} for case {row['case_id']} is dead: {error}")
+                conn.execute(
+                    "UPDATE jobs SET status = 'dead', lease_until = NULL, last_error = ?, updated_at = ? WHERE id = ?",
+                    (error, now, row["id"]),
+                )
+                return Job(conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+            if row["status"] == "running":
+                logger.warning(f"Re-claiming job {row['id']} for case {row['case_id']} after lease expiry")
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?,"
+                " worker_id = ?, lease_id = ?, updated_at = ? WHERE id = ?",
+                (now + self.visibility_timeout, worker_id, uuid.uuid4().hex, now, row["id"]),
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            return Job(row)
+
+    def heartbeat(self, job: Job) -> bool:
+        """Extend the lease of a running job. Returns False if the job was lost to another worker."""
+        now = time.time()
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND lease_id = ? AND status = 'running'",
+                (now + self.visibility_timeout, now, job.id, job.lease_id),
+            )
+            return cur.rowcount > 0
+
+    def complete(self, job: Job) -> bool:
+        """Mark the job done. Returns False if its lease was lost (another worker owns it)."""
+        now = time.time()
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'done', lease_until = NULL, updated_at = ?"
+                " WHERE id = ? AND lease_id = ? AND status = 'running'",
+                (now, job.id, job.lease_id),
+            )
+            job.lost = cur.rowcount == 0
+            return not job.lost
+
+    def fail(self, job: Job, error: str) -> bool:
+        """
+        Record a failed attempt. Returns True if the job will be retried, False
+        if it has exhausted its attempts and is now dead. Nothing is recorded
+        (and ``job.lost`` is set) if the lease was lost.
+        """
+        now = time.time()
+        retry = job.attempts < job.max_attempts
+        with self._transaction() as conn:
+            if retry:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (job.attempts - 1))
+                delay = random.uniform(delay / 2, delay)
+                cur = conn.execute(
+                    "UPDATE jobs SET status = 'pending', available_at = ?, lease_until = NULL,"
+                    " last_error = ?, updated_at = ? WHERE id = ? AND lease_id = ? AND status = 'running'",
+                    (now + delay, error, now, job.id, job.lease_id),
+                )
+            else:
+                cur = conn.execute(
+                    "UPDATE jobs SET status = 'dead', lease_until = NULL, last_error = ?, updated_at = ?"
+                    " WHERE id = ? AND lease_id = ? AND status = 'running'",
+                    (error, now, job.id, job.lease_id),
+                )
+            job.lost = cur.rowcount == 0
+        return retry
+
+    def depth(self) -> Dict[str, int]:
+        """Number of pending jobs per priority lane."""
+        names = {rank: name for name, rank in PRIORITY_LANES.items()}
+        counts = {name: 0 for name in PRIORITY_LANES}
+        for row in self._conn().execute(
+            "SELECT priority, COUNT(*) AS n FROM jobs WHERE status = 'pending' GROUP BY priority"
+        ):
+            counts[names.get(row["priority"], str(row["priority"]))] = row["n"]
+        return counts
+
+    def running(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0]
+
+
+JobHandler = Callable[[str], Awaitable[Any]]
+FailureHandler = Callable[[Job, str, bool], Any]
+
+
+class JobWorkerPool:
+    """
+    Runs up to ``concurrency`` jobs at a time from a ``JobQueue``.
+
+    ``handler`` is awaited with the case id and must raise to signal failure.
+    ``on_failure(job, error, will_retry)`` is called after each failed attempt.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handler: JobHandler,
+        concurrency: int = 2,
+        poll_interval: float = 1.0,
+        on_failure: Optional[FailureHandler] = None,
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.on_failure = on_failure
+        self.worker_prefix = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    def start(self) -> None:
+        for n in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._run(f"{self.worker_prefix}-{n}")))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle workers after an enqueue instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    async def _heartbeat(self, job: Job, task: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(self.queue.visibility_timeout / 3)
+            if not await asyncio.to_thread(self.queue.heartbeat, job):
+                logger.warning(f"Lost lease on job {job.id} for case {job.case_id}; stopping this run")
+                job.lost = True
+                task.cancel()
+                return
+
+    async def _run(self, worker_id: str) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(self.queue.claim, worker_id)
+            except Exception as e:
+                logger.error(f"Job claim failed: {e}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if job.status == "dead":
+                if self.on_failure is not None:
+                    self.on_failure(job, job.last_error or "Lease expired", False)
+                continue
+
+            metrics.STAGE_SECONDS.observe(max(0.0, time.time() - job.available_at), stage="queue_wait")
+            task = asyncio.create_task(self.handler(job.case_id))
+            heartbeat = asyncio.create_task(self._heartbeat(job, task))
+            try:
+                with metrics.span("analysis"):
+                    await task
+            except asyncio.CancelledError:
+                if job.lost:
+                    continue  # The worker that took over the lease records the outcome
+                # Shutting down: leave the lease to expire so another worker re-claims the job.
+                task.cancel()
+                raise
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+                will_retry = await asyncio.to_thread(self.queue.fail, job, error)
+                if job.lost:
+                    logger.warning(f"Job {job.id} for case {job.case_id} failed after its lease was lost: {error}")
+                    continue
+                logger.error(
+                    f"Job {job.id} for case {job.case_id} failed (attempt {job.attempts}/{job.max_attempts}): {error}"
+                )
+                if self.on_failure is not None:
+                    self.on_failure(job, error, will_retry)
+            else:
+                await asyncio.to_thread(self.queue.complete, job)
+            finally:
+                heartbeat.cancel()
+
+
+def get_job_queue(path: Optional[str] = None) -> JobQueue:
+    """Build the job queue from ``JOB_QUEUE_*`` environment settings."""
+    return JobQueue(
+        path or os.getenv("JOB_QUEUE_PATH", "kyc_jobs.db"),
+        visibility_timeout=float(os.getenv("JOB_VISIBILITY_TIMEOUT", "300")),
+        max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+        backoff_base=float(os.getenv("JOB_BACKOFF_BASE", "5")),
+        backoff_max=float(os.getenv("JOB_BACKOFF_MAX", "300")),
+    )
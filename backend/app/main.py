@@ -1,19 +1,29 @@
 import os
 import json
+import time
+import asyncio
 import logging
 from datetime import datetime
-from fastapi import FastAPI, HTTPException, Request, UploadFile, File, BackgroundTasks, Form
-import shutil
-import subprocess
-from fastapi.responses import RedirectResponse
+from fastapi import FastAPI, HTTPException, Request, Response, UploadFile, File, Form, Query
+from fastapi.responses import PlainTextResponse, RedirectResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
-from google_auth_oauthlib.flow import Flow
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 from dotenv import load_dotenv
 
+from app import metrics
+from app.blobs import get_blob_store
+from app.crew_client import run_crew
+from app.crew_logs import save_raw_log
+from app.events import TERMINAL_STATUSES, get_event_log
+from app.identity import PendingIdentities, get_identity_index, identity_keys, new_case_id
+from app.jobs import Job, JobWorkerPool, get_job_queue
+from app.reloads import SharedReloadable
+from app.risk import RiskEngine, rescore_store
+from app.screening import ScreeningIndex, screen_store
+from app.store import CaseQuery, get_case_store, migrate_json_store
+from app.uploads import file_sha256, materialize_documents, save_uploads
+
 load_dotenv()
 
 app = FastAPI(
@@ -38,6 +48,22 @@ client_config = {
     }
 }
 
+
+def oauth_flow():
+    """
+    Google OAuth flow for the login routes. google_auth_oauthlib (and the
+    requests/oauthlib stack behind it) is imported here on first use rather
+    than at startup, since nothing else in the API needs it.
+    """
+    from google_auth_oauthlib.flow import Flow
+
+    flow = Flow.from_client_config(
+        client_config,
+        scopes=["openid", "https://www.googleapis.com/auth/userinfo.profile", "https://www.googleapis.com/auth/userinfo.email"]
+    )
+    flow.redirect_uri = GOOGLE_REDIRECT_URI
+    return flow
+
 # Disable CORS. Do not remove this for full-stack development.
 app.add_middleware(
     CORSMiddleware,
@@ -45,35 +71,95 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor"],  # Pagination cursor for GET /kyc/cases
 )
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# --- Simple Persistence Layer ---
-CASE_STORE_FILE = "kyc_cases.json"
-UPLOAD_DIR = "uploads"
+# --- Persistence Layer ---
+CASE_STORE_FILE = "kyc_cases.json"  # Legacy whole-file store, imported once on startup
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+blob_store = get_blob_store(os.path.join(UPLOAD_DIR, ".blobs"))
 
-def load_cases() -> Dict[str, Any]:
-    if os.path.exists(CASE_STORE_FILE):
-        try:
-            with open(CASE_STORE_FILE, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Error loading cases: {e}")
-            return {}
-    return {}
+case_store = get_case_store()
+if case_store.count() == 0 and os.path.exists(CASE_STORE_FILE):
+    migrate_json_store(CASE_STORE_FILE, case_store)
+
+# Per-process copies, rebuilt in every API process after a reload in any of them
+risk_rules = SharedReloadable("risk_rules", RiskEngine.from_env)
+screening_lists = SharedReloadable("screening_lists", ScreeningIndex.from_env)
+identity_index = get_identity_index()
+event_log = get_event_log()
+event_log.prune(float(os.getenv("KYC_EVENTS_RETENTION_DAYS", "7")) * 86400)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep the label set bounded.
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status,
+        )
+
+def load_case(case_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        return case_store.get(case_id)
+    except Exception as e:
+        logger.error(f"Error loading case {case_id}: {e}")
+        return None
 
 def save_case(case_id: str, data: Dict[str, Any]):
     try:
-        cases = load_cases()
-        cases[case_id] = data
-        with open(CASE_STORE_FILE, 'w') as f:
-            json.dump(cases, f, indent=2)
+        with metrics.span("persist"):
+            case_store.put(case_id, data)
     except Exception as e:
         logger.error(f"Error saving case {case_id}: {e}")
 
+def update_case(case_id: str, **fields) -> Optional[Dict[str, Any]]:
+    """Atomically merge ``fields`` into an existing case, publishing status changes."""
+    def apply(case):
+        if case is None:
+            return None
+        case.update(fields)
+        return case
+    try:
+        with metrics.span("persist"):
+            case = case_store.update(case_id, apply)
+        if case is not None and "status" in fields:
+            event_log.publish(case_id, "status", {"status": fields["status"]})
+        return case
+    except Exception as e:
+        logger.error(f"Error updating case {case_id}: {e}")
+        return None
+
+def project_case(case: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """Keep only the requested (optionally dotted, e.g. ``risk_assessment.risk_level``) fields."""
+    projected: Dict[str, Any] = {}
+    for field in fields:
+        value: Any = case
+        parts = field.split(".")
+        for part in parts:
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+        else:
+            target = projected
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = value
+    return projected
+
 # --------------------------------
 
 class CustomerData(BaseModel):
@@ -102,6 +188,8 @@ class KYCResponse(BaseModel):
     customer_data: CustomerData
     analysis_results: Dict[str, Any]
     risk_assessment: Dict[str, Any]
+    screening: Optional[Dict[str, Any]] = None
+    possible_duplicates: List[Dict[str, Any]] = []
     recommendations: List[str]
     timestamp: str
     documents_processed: int
@@ -114,6 +202,14 @@ class LoginRequest(BaseModel):
 async def healthz():
     return {"status": "ok"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage latency histograms, model payload sizes, token usage and queue depth (Prometheus text format)."""
+    for lane, depth in job_queue.depth().items():
+        metrics.QUEUE_DEPTH.set(depth, priority=lane)
+    metrics.JOBS_RUNNING.set(job_queue.running())
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def read_root():
     return {
@@ -125,10 +221,15 @@ def read_root():
             "POST /auth/login": "Mock login for testing",
             "GET /auth/google": "Initiate Google OAuth login",
             "GET /auth/callback": "Google OAuth callback handler",
-            "GET /kyc/cases": "List all KYC cases",
+            "GET /kyc/cases": "List KYC cases (paginated; filter by status, risk_level, since/until; fields= projection)",
             "POST /kyc/process": "Submit a new KYC request",
+            "POST /kyc/process/bulk": "Submit many KYC requests (JSON array or NDJSON), streams per-record results",
+            "POST /kyc/risk/rescore": "Reload risk rules and re-score all scored cases",
+            "GET /kyc/screening/search": "Screen a name against the sanctions/PEP lists",
+            "POST /kyc/screening/reload": "Reload the sanctions/PEP lists and re-screen all scored cases",
             "POST /kyc/upload-documents": "Mock document upload endpoint",
             "GET /kyc/status/{case_id}": "Check status of a specific case",
+            "GET /kyc/events/{case_id}": "Stream live case progress (server-sent events, resumable)",
             "GET /healthz": "Health check"
         }
     }
@@ -144,12 +245,7 @@ async def google_login():
             detail="Google OAuth credentials not configured in backend .env"
         )
     
-    flow = Flow.from_client_config(
-        client_config,
-        scopes=["openid", "https://www.googleapis.com/auth/userinfo.profile", "https://www.googleapis.com/auth/userinfo.email"]
-    )
-    flow.redirect_uri = GOOGLE_REDIRECT_URI
-    
+    flow = oauth_flow()
     authorization_url, state = flow.authorization_url(
         access_type='offline',
         include_granted_scopes='true'
@@ -163,12 +259,12 @@ async def google_callback(code: str, request: Request):
     Handle Google OAuth callback.
     """
     try:
-        flow = Flow.from_client_config(
-            client_config,
-            scopes=["openid", "https://www.googleapis.com/auth/userinfo.profile", "https://www.googleapis.com/auth/userinfo.email"]
-        )
-        flow.redirect_uri = GOOGLE_REDIRECT_URI
-        
+        # Imported on first use: only the auth routes need google-auth
+        from google.oauth2 import id_token
+        from google.auth.transport import requests as google_requests
+
+        flow = oauth_flow()
+
         # Exchange code for tokens
         flow.fetch_token(code=code)
         credentials = flow.credentials
@@ -205,37 +301,91 @@ async def login(request: LoginRequest):
     }
 
 @app.get("/kyc/cases")
-async def list_cases():
-    """List all KYC cases for the dashboard."""
-    cases = load_cases()
-    return list(cases.values())
+async def list_cases(
+    response: Response,
+    status: Optional[str] = None,
+    risk_level: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    fields: Optional[str] = None,
+):
+    """
+    List KYC cases for the dashboard, newest first.
+
+    Results are paginated: when more cases match, the ``X-Next-Cursor``
+    response header carries the ``cursor`` for the next page. ``fields`` is a
+    comma-separated projection (e.g. ``case_id,status,risk_assessment.risk_level``)
+    so list views can skip the large analysis results.
+    """
+    try:
+        query = CaseQuery(
+            status=status,
+            risk_level=risk_level.upper() if risk_level else None,
+            since=since,
+            until=until,
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    cases, next_cursor = case_store.query(query)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if fields:
+        wanted = [f.strip() for f in fields.split(",") if f.strip()]
+        cases = [project_case(case, wanted) for case in cases]
+    return cases
 
 @app.get("/kyc/status/{case_id}")
 async def get_case_status(case_id: str):
-    cases = load_cases()
-    if case_id not in cases:
+    case = load_case(case_id)
+    if case is None:
         raise HTTPException(status_code=404, detail="Case not found")
-    return cases[case_id]
+    return case
+
+@app.get("/kyc/events/{case_id}")
+async def stream_case_events(case_id: str, request: Request, last_event_id: Optional[int] = None):
+    """
+    Server-sent events for one case: status transitions, per-file results and
+    per-page OCR progress. Reconnecting clients resume after the
+    ``Last-Event-ID`` header (or ``last_event_id`` query parameter). The
+    stream ends once the case is completed or failed.
+    """
+    if load_case(case_id) is None:
+        raise HTTPException(status_code=404, detail="Case not found")
+    try:
+        after_id = int(request.headers.get("last-event-id") or last_event_id or 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    
+    def done() -> bool:
+        case = load_case(case_id)
+        return case is None or case.get("status") in TERMINAL_STATUSES
+    
+    return StreamingResponse(
+        event_log.stream(case_id, after_id, done),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.post("/kyc/upload-docs")
 async def upload_kyc_docs(
     full_name: str = Form(...),
     files: List[UploadFile] = File(...),
+    priority: str = Form("standard"),
 ):
     """
     Actual document upload endpoint that starts the process.
     """
-    case_id = f"KYC-{datetime.utcnow().strftime('%Y%m%d')}-{abs(hash(full_name)) % 10000:04d}"
+    case_id = new_case_id()
     
-    saved_files = []
     case_dir = os.path.join(UPLOAD_DIR, case_id)
-    os.makedirs(case_dir, exist_ok=True)
-    
-    for file in files:
-        file_path = os.path.join(case_dir, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        saved_files.append(os.path.abspath(file_path))
+    with metrics.span("upload"):
+        documents = await save_uploads(files, case_dir, blob_store)
+    saved_files = [document["path"] for document in documents]
     
     # Initial case status
     case_data = {
@@ -243,84 +393,304 @@ async def upload_kyc_docs(
         "status": "uploading",
         "customer_data": {"full_name": full_name},
         "files": saved_files,
+        "documents": documents,
+        "priority": priority,
         "timestamp": datetime.utcnow().isoformat(),
         "analysis_results": {},
         "risk_assessment": {}
     }
+    register_identity(case_data)
     save_case(case_id, case_data)
     
     return {"status": "success", "case_id": case_id, "files": saved_files}
 
 @app.post("/kyc/start-analysis/{case_id}")
-async def start_kyc_analysis(case_id: str, background_tasks: BackgroundTasks):
-    """Trigger the CrewAI agent in the background."""
-    cases = load_cases()
-    if case_id not in cases:
+async def start_kyc_analysis(case_id: str, priority: Optional[str] = None, force: bool = False):
+    """
+    Queue the CrewAI agents for this case on the durable job queue. Files
+    already analyzed with unchanged content are reused unless ``force`` is set.
+    """
+    if force:
+        case = case_store.update(case_id, clear_checkpoints)
+        if case is None:
+            raise HTTPException(status_code=404, detail="Case not found")
+    case = update_case(case_id, status="queued")
+    if case is None:
         raise HTTPException(status_code=404, detail="Case not found")
     
-    cases[case_id]["status"] = "analyzing"
-    save_case(case_id, cases[case_id])
+    job_id = job_queue.enqueue(case_id, priority or case.get("priority"))
+    job_workers.notify()
+    return {"status": "started", "case_id": case_id, "job_id": job_id}
+
+CASE_FILE_CONCURRENCY = int(os.getenv("CASE_FILE_CONCURRENCY", "4"))
+
+def clear_checkpoints(case: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if case is None:
+        return None
+    analysis = case.setdefault("analysis_results", {})
+    analysis.pop("documents", None)
+    analysis["force"] = True  # Also skip results of identical files in other cases
+    return case
+
+def register_identity(case: Dict[str, Any], pending: Optional[PendingIdentities] = None):
+    """
+    Record the case's possible duplicates (other cases sharing an identity key)
+    on it and index its keys. ``pending`` holds the keys of cases indexed
+    together in one batch, which are matched too and written by the caller.
+    """
+    keys = identity_keys(case)
+    try:
+        duplicates = identity_index.matches(keys, exclude=case["case_id"])
+    except Exception as e:
+        logger.error(f"Identity lookup failed for case {case['case_id']}: {e}")
+        duplicates = []
+    if pending is not None:
+        duplicates = (duplicates + pending.matches(keys, exclude=case["case_id"]))[:identity_index.max_matches]
+        pending.add(case["case_id"], keys)
+    else:
+        try:
+            identity_index.index(case["case_id"], keys)
+        except Exception as e:
+            logger.error(f"Identity indexing failed for case {case['case_id']}: {e}")
+    case["possible_duplicates"] = duplicates
+    if duplicates:
+        logger.info(f"Case {case['case_id']}: possible duplicate of {[d['case_id'] for d in duplicates]}")
+
+def prior_result(case_id: str, sha256: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    A completed result for identical file content in another case, if any.
+    Only the newest ``max_matches`` cases with the file are considered, and
+    the first one with a completed result is used.
+    """
+    if not sha256:
+        return None
+    for other_id in identity_index.cases_with(f"doc:{sha256}"):
+        if other_id == case_id:
+            continue
+        other = load_case(other_id) or {}
+        for document in (other.get("analysis_results") or {}).get("documents") or []:
+            if document.get("sha256") == sha256 and document.get("status") == "completed":
+                return {**document, "reused_from": other_id}
+    return None
+
+def checkpoint_file_result(case_id: str, result: Dict[str, Any]):
+    """Persist one file's result into the case as soon as it finishes, replacing any earlier one."""
+    def apply(case):
+        if case is None:
+            return None
+        analysis = case.setdefault("analysis_results", {})
+        documents = [d for d in analysis.get("documents") or [] if d.get("file") != result["file"]]
+        analysis["documents"] = documents + [result]
+        return case
+    try:
+        with metrics.span("persist"):
+            case_store.update(case_id, apply)
+    except Exception as e:
+        logger.error(f"Error checkpointing {result['file']} for case {case_id}: {e}")
+
+def content_hashes(case: Dict[str, Any]) -> Dict[str, str]:
+    """sha256 per case file, from the upload records or, for older cases, the file itself."""
+    hashes = {d["path"]: d["sha256"] for d in case.get("documents") or [] if d.get("sha256")}
+    for file_path in case.get("files") or []:
+        if file_path not in hashes and os.path.exists(file_path):
+            hashes[file_path] = file_sha256(file_path)
+    return hashes
+
+async def analyze_file(
+    case_id: str, file_path: str, slots: asyncio.Semaphore, sha256: Optional[str] = None
+) -> Dict[str, Any]:
+    """Run the crew on one case file; the crew routes it to the PDF or image task by type."""
+    async with slots:
+        # Runs in the persistent crew pool when configured, else a one-off
+        # `uv run run_crew` subprocess in the kycagents env. Off the event loop
+        # either way since it blocks for the whole analysis.
+        run = await asyncio.to_thread(run_crew, file_path, case_id)
     
-    background_tasks.add_task(run_agent_workflow, case_id)
-    return {"status": "started", "case_id": case_id}
+    # Only the typed extraction goes into the case; raw agent output is
+    # compressed to side storage.
+    # Keyed on the full stored name: id.pdf and id.png in one case are different files.
+    raw_log = await asyncio.to_thread(
+        save_raw_log, case_id, os.path.basename(file_path), (run.get("stdout") or "") + (run.get("stderr") or "")
+    )
+    result = {
+        "file": file_path,
+        "sha256": sha256,
+        "status": "completed" if run["returncode"] == 0 else "failed",
+        "extraction": run.get("extraction"),
+        "raw_log": raw_log,
+    }
+    if run["returncode"] != 0:
+        error = run.get("stderr") or f"Crew exited with code {run['returncode']}"
+        result["error"] = error[-2000:]
+    await asyncio.to_thread(checkpoint_file_result, case_id, result)
+    event_log.publish(case_id, "file", {"file": os.path.basename(file_path), "status": result["status"]})
+    return result
+
+def summarize_extraction(documents: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Pick the identity fields shown in the UI from the most confident extraction."""
+    def name_confidence(document):
+        return ((document.get("extraction") or {}).get("full_name") or {}).get("confidence") or 0
+    
+    candidates = [d for d in documents if d.get("extraction")]
+    if not candidates:
+        return None
+    extraction = max(candidates, key=name_confidence)["extraction"]
+    fields = ["full_name", "document_number", "date_of_birth", "nationality", "expiry_date", "document_type"]
+    
+    def value(field):
+        return (extraction.get(field) or {}).get("value")
+    
+    return {
+        "name": value("full_name"),
+        "id": value("document_number"),
+        "date_of_birth": value("date_of_birth"),
+        "nationality": value("nationality"),
+        "expiry_date": value("expiry_date"),
+        "document_type": value("document_type"),
+        "confidence": {f: (extraction.get(f) or {}).get("confidence") for f in fields},
+    }
 
 async def run_agent_workflow(case_id: str):
-    """Background task to run CrewAI agents."""
+    """
+    Run the CrewAI agents on every file of a case, in parallel, and merge the
+    per-file results into the case. Each file's result is checkpointed with
+    its content hash as it finishes, so a retry or re-run only analyzes files
+    that failed or changed. Called by the job workers; raises on failure so
+    the job queue can retry it.
+    """
     try:
-        cases = load_cases()
-        case = cases.get(case_id)
-        if not case or not case.get("files"):
+        case = update_case(case_id, status="analyzing")
+        if not case:
+            return  # Deleted since it was queued
+        if not case.get("files"):
+            update_case(
+                case_id,
+                status="completed",
+                analysis_results={"documents": [], "agent_notes": "No documents to analyze."},
+            )
             return
+        # The upload may have been received by another node
+        await asyncio.to_thread(materialize_documents, case, blob_store)
 
-        file_path = case["files"][0] # Just use the first one for now
-        
-        # We'll use subprocess to run the crew command safely in its own env
-        # Navigate to kycagents dir and run uv run run_crew
-        kyc_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "kycagents"))
-        
-        # Force UTF-8 encoding for Windows specifically to handle emojis in CrewAI output
-        env = os.environ.copy()
-        env["PYTHONUTF8"] = "1"
+        hashes = await asyncio.to_thread(content_hashes, case)
+        allow_cross_case = not (case.get("analysis_results") or {}).get("force")
+        checkpoints = {
+            d["file"]: d for d in (case.get("analysis_results") or {}).get("documents") or []
+            if d.get("status") == "completed" and d.get("sha256")
+        }
+
+        reused: List[str] = []
+
+        async def analyze_or_reuse(file_path: str) -> Dict[str, Any]:
+            checkpoint = checkpoints.get(file_path)
+            if checkpoint and checkpoint["sha256"] == hashes.get(file_path):
+                reused.append(file_path)
+                event_log.publish(case_id, "file", {"file": os.path.basename(file_path), "status": "completed", "reused": True})
+                return checkpoint
+            prior = await asyncio.to_thread(prior_result, case_id, hashes.get(file_path)) if allow_cross_case else None
+            if prior:
+                # Same bytes already analyzed for another case; skip OCR and the LLM.
+                result = {**prior, "file": file_path}
+                reused.append(file_path)
+                await asyncio.to_thread(checkpoint_file_result, case_id, result)
+                event_log.publish(case_id, "file", {"file": os.path.basename(file_path), "status": "completed", "reused": True})
+                return result
+            return await analyze_file(case_id, file_path, slots, hashes.get(file_path))
+
+        slots = asyncio.Semaphore(CASE_FILE_CONCURRENCY)
+        documents = await asyncio.gather(*(analyze_or_reuse(f) for f in case["files"]))
+        if reused:
+            logger.info(f"Case {case_id}: reused {len(reused)} of {len(documents)} file results")
+        failed = [d for d in documents if d["status"] != "completed"]
         
-        process = subprocess.Popen(
-            ["uv", "run", "run_crew", file_path],
-            cwd=kyc_dir,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            encoding='utf-8',
-            env=env
+        customer_data = dict(case.get("customer_data") or {})
+        extracted = summarize_extraction(documents)
+        if extracted:
+            customer_data["extracted"] = extracted
+            # The extracted document number is a new identity key
+            case = {**case, "customer_data": customer_data}
+            await asyncio.to_thread(register_identity, case)
+        # On failure the status is left to record_job_failure (queued for retry, or failed).
+        analysis_results = {
+            "documents": documents,
+            "agent_notes": "Extraction completed via GLM-OCR."
+        }
+        if failed and not allow_cross_case:
+            analysis_results["force"] = True  # The retry must not reuse other cases' results either
+        update_case(
+            case_id,
+            **({} if failed else {"status": "completed"}),
+            customer_data=customer_data,
+            possible_duplicates=case.get("possible_duplicates") or [],
+            analysis_results=analysis_results,
         )
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {len(documents)} files failed: {failed[0]['error']}")
         
-        stdout, stderr = process.communicate()
-        
-        if process.returncode == 0:
-            # Try to find a report.md or extract from stdout
-            # For this demo, we'll assume the agent adds results to the case store
-            # Since the agent runs in a separate process, we'll mock the extraction
-            # In a real app, the agent would use a Tool to update a DB or File.
-            
-            case["status"] = "completed"
-            case["analysis_results"] = {
-                "raw_output": stdout,
-                "agent_notes": "Extraction completed via GLM-OCR."
-            }
-            # Mocking some structured data extraction for the UI
-            if "John Doe" in stdout:
-               case["customer_data"]["extracted"] = {"name": "John Doe", "id": "123456789"}
-        else:
-            case["status"] = "failed"
-            case["analysis_results"] = {"error": stderr}
-            
-        save_case(case_id, case)
-        
     except Exception as e:
-        logger.error(f"Background task failed: {e}")
-        cases = load_cases()
-        if case_id in cases:
-            cases[case_id]["status"] = "failed"
-            save_case(case_id, cases[case_id])
+        logger.error(f"Agent workflow for {case_id} failed: {e}")
+        raise
+
+def record_job_failure(job: Job, error: str, will_retry: bool):
+    def apply(case):
+        if case is None:
+            return None
+        case["status"] = "queued" if will_retry else "failed"
+        case["analysis_results"] = {**(case.get("analysis_results") or {}), "error": error, "attempts": job.attempts}
+        if not will_retry:
+            case["analysis_results"].pop("force", None)  # Only binds the retries of this job
+        return case
+    try:
+        case = case_store.update(job.case_id, apply)
+        if case is not None:
+            event_log.publish(job.case_id, "status", {"status": case["status"], "error": error[-500:]})
+    except Exception as e:
+        logger.error(f"Error recording failure for case {job.case_id}: {e}")
 
+job_queue = get_job_queue()
+job_workers = JobWorkerPool(
+    job_queue,
+    run_agent_workflow,
+    concurrency=int(os.getenv("JOB_WORKERS", "2")),
+    on_failure=record_job_failure,
+)
+
+@app.on_event("startup")
+async def start_job_workers():
+    job_workers.start()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_workers.stop()
+
+
+def build_kyc_case(
+    request: KYCRequest, risk_assessment: Dict[str, Any], screening: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Build the case record for a scored KYC request (without saving or indexing it)."""
+    case_id = new_case_id()
+    
+    # Agent analysis (Simulated)
+    analysis_results = {
+        "agent_response": f"AI analysis completed for {request.customer_data.full_name}",
+        "internal_database_check": "completed",
+        "document_analysis": "completed" if request.document_types else "skipped",
+        "external_searches": "completed",
+        "wealth_assessment": "completed"
+    }
+    
+    return {
+        "case_id": case_id,
+        "status": "completed",
+        "customer_data": request.customer_data.dict(),
+        "analysis_results": analysis_results,
+        "risk_assessment": risk_assessment,
+        "screening": screening,
+        "recommendations": [risk_assessment["recommendation"], "Verify document authenticity"],
+        "timestamp": datetime.utcnow().isoformat(),
+        "documents_processed": len(request.document_types or []),
+        "priority": request.priority
+    }
 
 @app.post("/kyc/process", response_model=KYCResponse)
 async def process_kyc_request(request: KYCRequest):
@@ -330,52 +700,12 @@ async def process_kyc_request(request: KYCRequest):
     try:
         logger.info(f"Processing KYC request for customer: {request.customer_data.full_name}")
         
-        case_id = f"KYC-{datetime.utcnow().strftime('%Y%m%d')}-{abs(hash(request.customer_data.full_name)) % 10000:04d}"
-        
-        # Risk Logic (Simulated)
-        analysis_results = {
-            "agent_response": f"AI analysis completed for {request.customer_data.full_name}",
-            "internal_database_check": "completed",
-            "document_analysis": "completed" if request.document_types else "skipped",
-            "external_searches": "completed",
-            "wealth_assessment": "completed"
-        }
-        
-        risk_score = 0
-        risk_factors = []
-        
-        high_risk_countries = ['AF', 'IR', 'KP', 'SY', 'MM', 'BY', 'RU', 'CN']
-        nationality = (request.customer_data.nationality or "").upper()
-        if nationality in high_risk_countries:
-            risk_score += 35
-            risk_factors.append("High-risk jurisdiction")
-            
-        if request.customer_data.is_pep:
-            risk_score += 40
-            risk_factors.append("Politically Exposed Person (PEP)")
-            
-        risk_score = min(risk_score, 100)
-        risk_level = "HIGH" if risk_score >= 70 else "MEDIUM" if risk_score >= 40 else "LOW"
-        
-        risk_assessment = {
-            "risk_score": risk_score,
-            "risk_level": risk_level,
-            "risk_factors": risk_factors,
-            "recommendation": "Manual review required" if risk_level != "LOW" else "Approved for onboarding"
-        }
-        
-        response_data = {
-            "case_id": case_id,
-            "status": "completed",
-            "customer_data": request.customer_data.dict(),
-            "analysis_results": analysis_results,
-            "risk_assessment": risk_assessment,
-            "recommendations": [risk_assessment["recommendation"], "Verify document authenticity"],
-            "timestamp": datetime.utcnow().isoformat(),
-            "documents_processed": len(request.document_types or [])
-        }
-        
-        save_case(case_id, response_data)
+        customer_data = request.customer_data.dict()
+        with metrics.span("screening"):
+            screening = screening_lists.get().screen_customer(customer_data)
+        response_data = build_kyc_case(request, risk_rules.get().assess(customer_data, screening), screening)
+        register_identity(response_data)
+        save_case(response_data["case_id"], response_data)
         
         return KYCResponse(**response_data)
         
@@ -383,6 +713,159 @@ async def process_kyc_request(request: KYCRequest):
         logger.error(f"Error processing KYC request: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+async def iter_bulk_records(request: Request):
+    """Yield raw records from an NDJSON stream or a JSON array body."""
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
+        return
+    
+    body = await asyncio.to_thread(json.loads, await request.body())
+    if not isinstance(body, list):
+        raise ValueError("Expected a JSON array of KYC requests")
+    for record in body:
+        yield record
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+def score_bulk_chunk(start: int, raws: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Validate, screen, score and save one chunk of bulk records (input
+    positions ``start`` onwards) in one store transaction. Blocking; run in a
+    worker thread. Returns one result per record.
+    """
+    results: List[Dict[str, Any]] = []
+    valid: List[KYCRequest] = []
+    for offset, raw in enumerate(raws):
+        try:
+            record = json.loads(raw) if isinstance(raw, (bytes, str)) else raw
+            valid.append(KYCRequest(**record))
+            results.append({"index": start + offset})
+        except Exception as e:
+            results.append({"index": start + offset, "status": "error", "error": str(e)})
+
+    # Screen, then score every valid record column-wise in one pass.
+    customers = [r.customer_data.dict() for r in valid]
+    with metrics.span("screening", batch="bulk"):
+        screenings = screening_lists.get().screen_batch(customers)
+    assessments = risk_rules.get().assess_batch(customers, screenings)
+    cases: Dict[str, Dict[str, Any]] = {}
+    # Earlier chunks are already in the identity index; this one is matched against itself here.
+    identities = PendingIdentities(identity_index.max_matches)
+    pending = iter(zip(valid, assessments, screenings))
+    for result in results:
+        if "error" in result:
+            continue
+        kyc_request, assessment, screening = next(pending)
+        case = build_kyc_case(kyc_request, assessment, screening)
+        register_identity(case, identities)
+        cases[case["case_id"]] = case
+        result.update(
+            case_id=case["case_id"],
+            status=case["status"],
+            risk_level=assessment["risk_level"],
+            risk_score=assessment["risk_score"],
+            possible_duplicates=[d["case_id"] for d in case["possible_duplicates"]],
+        )
+
+    try:
+        with metrics.span("persist", batch="bulk"):
+            case_store.put_many(cases)
+            identity_index.index_many(identities.cases)
+    except Exception as e:
+        logger.error(f"Error saving bulk KYC chunk at record {start}: {str(e)}")
+        return [{"index": r["index"], "status": "error", "error": r.get("error") or f"Not saved: {e}"} for r in results]
+    return results
+
+@app.post("/kyc/process/bulk")
+async def process_kyc_bulk(request: Request):
+    """
+    Score many KYC requests in one call.
+
+    Accepts a JSON array of ``KYCRequest`` objects or NDJSON
+    (``Content-Type: application/x-ndjson``, one request per line). Records
+    are processed in chunks of ``BULK_CHUNK_SIZE`` off the event loop, each
+    saved in one store transaction, and one NDJSON result line per input
+    record (in input order) is streamed back as each chunk is saved. NDJSON
+    input is read as it arrives.
+    """
+    records = iter_bulk_records(request).__aiter__()
+    # Read the first record before responding, so a malformed body is still a 400.
+    try:
+        first = [await records.__anext__()]
+    except StopAsyncIteration:
+        first = []
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid bulk payload: {str(e)}")
+
+    async def stream_results():
+        chunk, start, saved = first, 0, 0
+
+        async def flush():
+            nonlocal chunk, start, saved
+            results = await asyncio.to_thread(score_bulk_chunk, start, chunk)
+            saved += sum(1 for r in results if "case_id" in r)
+            start += len(chunk)
+            chunk = []
+            return "".join(json.dumps(result) + "\n" for result in results)
+
+        async for raw in records:
+            chunk.append(raw)
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                yield await flush()
+        if chunk:
+            yield await flush()
+        logger.info(f"Bulk KYC: saved {saved} cases from {start} records")
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.post("/kyc/risk/rescore")
+async def rescore_cases():
+    """Reload the risk rules (RISK_RULES_PATH) and re-score every scored case."""
+    try:
+        risk_engine = await asyncio.to_thread(risk_rules.reload)
+        updated = await asyncio.to_thread(rescore_store, case_store, risk_engine)
+    except Exception as e:
+        logger.error(f"Error re-scoring cases: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    return {"status": "completed", "updated": updated}
+
+@app.get("/kyc/screening/search")
+def search_screening_lists(
+    name: str,
+    date_of_birth: Optional[str] = None,
+    nationality: Optional[str] = None,
+    limit: int = Query(5, ge=1, le=100),
+):
+    """Screen a name (optionally with date of birth and nationality) against the loaded lists."""
+    index = screening_lists.get()
+    return {
+        "lists_version": index.version,
+        "matches": index.screen(name, date_of_birth, nationality, limit=limit),
+    }
+
+@app.post("/kyc/screening/reload")
+async def reload_screening_lists():
+    """Reload the lists (SCREENING_LISTS), then re-screen and re-score every scored case."""
+    try:
+        screening_index = await asyncio.to_thread(screening_lists.reload)
+        updated = await asyncio.to_thread(screen_store, case_store, screening_index, risk_rules.get())
+    except Exception as e:
+        logger.error(f"Error re-screening cases: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    return {"status": "completed", "entries": len(screening_index), "updated": updated}
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Several workers need the app as an import string. Cases, jobs, events and
+    # identities are shared through the stores; rules and screening lists are
+    # per-process copies that follow reloads in any worker (app.reloads).
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, workers=int(os.getenv("API_WORKERS", "1")))
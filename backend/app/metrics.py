@@ -0,0 +1,166 @@
+"""
+Minimal Prometheus-style metrics and stage timing.
+
+``span(stage)`` times a block into the ``kyc_stage_seconds`` histogram. The
+crew process records its own stages (crew start-up, PDF rasterization,
+per-page vision calls, LLM reasoning) and token usage with
+``kycagents.telemetry``. Those records come back with each crew run and are
+merged here with ``ingest()``. ``render()`` produces the text exposition
+format served at ``GET /metrics``.
+"""
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = (10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000, 10_000_000)
+
+
+def _key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(k)} {v}" for k, v in sorted(self._values.items())]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[_key(labels)] = value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(k)} {v}" for k, v in sorted(self._values.items())]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label key -> (per-bucket counts, sum, count)
+        self._values: Dict[LabelKey, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    le = "+Inf" if bound == math.inf else repr(float(bound))
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("kyc_stage_seconds", "Latency of KYC pipeline stages in seconds.")
+HTTP_REQUEST_SECONDS = Histogram("kyc_http_request_seconds", "API request latency in seconds.")
+MODEL_BYTES_SENT = Histogram("kyc_model_bytes_sent", "Bytes of page image sent per vision model call.", BYTES_BUCKETS)
+LLM_TOKENS = Counter("kyc_llm_tokens_total", "LLM tokens used by crew runs.")
+CREW_RUNS = Counter("kyc_crew_runs_total", "Crew runs by outcome.")
+MODEL_RETRIES = Counter("kyc_model_http_retries_total", "Model backend calls retried, by failure reason.")
+LLM_CACHE = Counter("kyc_llm_cache_total", "Crew LLM response cache lookups by result and task.")
+QUEUE_DEPTH = Gauge("kyc_job_queue_depth", "Pending analysis jobs per priority lane.")
+JOBS_RUNNING = Gauge("kyc_jobs_running", "Analysis jobs currently leased by a worker.")
+
+REGISTRY: Dict[str, Metric] = {
+    m.name: m for m in (
+        STAGE_SECONDS, HTTP_REQUEST_SECONDS, MODEL_BYTES_SENT, LLM_TOKENS, CREW_RUNS, MODEL_RETRIES, LLM_CACHE,
+        QUEUE_DEPTH, JOBS_RUNNING,
+    )
+}
+
+
+@contextmanager
+def span(stage: str, **labels):
+    """Time a pipeline stage into ``kyc_stage_seconds``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage, **labels)
+        logger.debug(f"stage={stage} seconds={elapsed:.4f} {labels}")
+
+
+def ingest(records: Iterable[Dict[str, Any]]) -> None:
+    """Merge telemetry records reported by the crew process (see kycagents.telemetry)."""
+    for record in records or ():
+        metric = REGISTRY.get(record.get("name"))
+        labels = record.get("labels") or {}
+        value = float(record.get("value", 0))
+        if isinstance(metric, Histogram):
+            metric.observe(value, **labels)
+        elif isinstance(metric, Counter):
+            metric.inc(value, **labels)
+        elif isinstance(metric, Gauge):
+            metric.set(value, **labels)
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY.values()) + "\n"
@@ -0,0 +1,73 @@
+"""
+Reloadable configuration shared by several API processes.
+
+The risk rules and the screening index are loaded into each API process.
+When one process reloads them (``POST /kyc/risk/rescore``,
+``POST /kyc/screening/reload``), it writes a new generation token to a small
+file next to the SQLite stores. The other processes check that token at most
+every ``RELOAD_CHECK_INTERVAL`` seconds and rebuild their copy on their next
+use, so every worker scores against the same rules and lists.
+
+Configuration (environment):
+    RELOAD_STATE_DIR       directory of the generation files (default: working directory)
+    RELOAD_CHECK_INTERVAL  seconds between generation checks (default 2)
+"""
+import os
+import time
+import uuid
+import logging
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SharedReloadable(Generic[T]):
+    """A process-local object, rebuilt with ``build`` when any process bumps its generation."""
+
+    def __init__(self, name: str, build: Callable[[], T], state_dir: Optional[str] = None, check_interval: Optional[float] = None):
+        self.name = name
+        self.build = build
+        self.path = os.path.join(state_dir or os.getenv("RELOAD_STATE_DIR", "."), f"kyc_reload_{name}")
+        self.check_interval = (
+            float(os.getenv("RELOAD_CHECK_INTERVAL", "2")) if check_interval is None else check_interval
+        )
+        self._lock = threading.Lock()
+        self._generation = self._read_generation()
+        self._checked_at = time.monotonic()
+        self._value = build()
+
+    def _read_generation(self) -> str:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return ""
+
+    def get(self) -> T:
+        """The current object, rebuilt first if another process reloaded it since the last check."""
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return self._value
+        with self._lock:
+            if time.monotonic() - self._checked_at >= self.check_interval:
+                generation = self._read_generation()
+                if generation != self._generation:
+                    logger.info(f"Reloading {self.name} (generation {generation})")
+                    self._value = self.build()
+                    self._generation = generation
+                self._checked_at = time.monotonic()
+        return self._value
+
+    def reload(self) -> T:
+        """Rebuild the object here and signal every other process to do the same."""
+        with self._lock:
+            value = self.build()
+            generation = uuid.uuid4().hex
+            tmp_path = f"{self.path}.{generation}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(generation)
+            os.replace(tmp_path, self.path)
+            self._value, self._generation, self._checked_at = value, generation, time.monotonic()
+        return value
@@ -0,0 +1,226 @@
+"""
+Rule-based KYC risk scoring.
+
+Rules are compiled once into lookup tables (country -> weight, source of
+wealth -> weight, occupation -> weight, and sorted ``net_worth`` band edges),
+so a single customer or a whole book of customers is scored with table
+lookups: ``assess`` for one record, ``assess_batch`` column-wise over a
+pandas DataFrame.
+
+Rules come from the JSON file named by ``RISK_RULES_PATH`` (if set), merged
+over the defaults below, which reproduce the original inline scoring
+(plus list screening, see ``app.screening``)::
+
+    {
+      "high_risk_countries": {"countries": ["AF", "IR"], "weight": 35},
+      "pep_weight": 40,
+      "sanctions_weight": 100,
+      "net_worth_bands": [{"min": 10000000, "weight": 15, "label": "Very high net worth"}],
+      "source_of_wealth": {"inheritance": 10, "crypto": 20},
+      "occupation": {"arms dealer": 40},
+      "levels": {"HIGH": 70, "MEDIUM": 40},
+      "max_score": 100
+    }
+"""
+import os
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.store import CaseStore, CaseUpdater
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES: Dict[str, Any] = {
+    "high_risk_countries": {
+        "countries": ['AF', 'IR', 'KP', 'SY', 'MM', 'BY', 'RU', 'CN'],
+        "weight": 35,
+    },
+    "pep_weight": 40,
+    "sanctions_weight": 100,
+    "net_worth_bands": [],
+    "source_of_wealth": {},
+    "occupation": {},
+    "levels": {"HIGH": 70, "MEDIUM": 40},
+    "max_score": 100,
+}
+
+
+def load_rules(path: Optional[str] = None) -> Dict[str, Any]:
+    rules = json.loads(json.dumps(DEFAULT_RULES))
+    path = path or os.getenv("RISK_RULES_PATH")
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            rules.update(json.load(f))
+    return rules
+
+
+class RiskEngine:
+    """Risk rules compiled into lookup tables."""
+
+    def __init__(self, rules: Dict[str, Any]):
+        self.rules = rules
+        countries = rules["high_risk_countries"]
+        self.country_weights = {c.upper(): float(countries["weight"]) for c in countries["countries"]}
+        self.pep_weight = float(rules["pep_weight"])
+        self.sanctions_weight = float(rules["sanctions_weight"])
+        self.wealth_weights = {k.lower(): float(v) for k, v in rules["source_of_wealth"].items()}
+        self.occupation_weights = {k.lower(): float(v) for k, v in rules["occupation"].items()}
+
+        bands = sorted(rules["net_worth_bands"], key=lambda b: b["min"])
+        # Band i covers [edges[i], edges[i+1]); values below the first edge score 0.
+        self.band_edges = np.array([b["min"] for b in bands], dtype=float)
+        self.band_weights = np.array([0.0] + [float(b["weight"]) for b in bands])
+        self.band_labels = [None] + [b.get("label", "Net worth band") for b in bands]
+
+        levels = sorted(rules["levels"].items(), key=lambda kv: kv[1], reverse=True)
+        self.level_names = [name for name, _ in levels]
+        self.level_thresholds = [float(threshold) for _, threshold in levels]
+        self.max_score = float(rules["max_score"])
+
+    @classmethod
+    def from_env(cls) -> "RiskEngine":
+        return cls(load_rules())
+
+    def _level(self, scores: np.ndarray) -> np.ndarray:
+        levels = np.full(scores.shape, "LOW", dtype=object)
+        # Apply lowest threshold first so higher levels overwrite.
+        for name, threshold in reversed(list(zip(self.level_names, self.level_thresholds))):
+            levels[scores >= threshold] = name
+        return levels
+
+    def assess_batch(
+        self,
+        customers: Iterable[Dict[str, Any]],
+        screenings: Optional[Iterable[Optional[Dict[str, Any]]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Score many customers column-wise. Returns one risk assessment per
+        customer, in order. ``screenings`` are the customers' list screening
+        results (``ScreeningIndex.screen_customer``), if screened.
+        """
+        frame = pd.DataFrame(list(customers), columns=[
+            "nationality", "is_pep", "net_worth", "source_of_wealth", "occupation"
+        ])
+        if frame.empty:
+            return []
+        screenings = list(screenings) if screenings is not None else [None] * len(frame)
+        sanctions_hits = [_best_match(s, "sanctions") for s in screenings]
+        pep_hits = [_best_match(s, "pep") for s in screenings]
+
+        country = frame["nationality"].fillna("").astype(str).str.upper().map(self.country_weights).fillna(0.0).to_numpy()
+        declared_pep = frame["is_pep"].fillna(False).astype(bool).to_numpy()
+        pep = (declared_pep | np.array([hit is not None for hit in pep_hits])) * self.pep_weight
+        sanctions = np.array([hit is not None for hit in sanctions_hits]) * self.sanctions_weight
+        wealth = frame["source_of_wealth"].fillna("").astype(str).str.lower().map(self.wealth_weights).fillna(0.0).to_numpy()
+        occupation = frame["occupation"].fillna("").astype(str).str.lower().map(self.occupation_weights).fillna(0.0).to_numpy()
+
+        net_worth = pd.to_numeric(frame["net_worth"], errors="coerce").to_numpy(dtype=float)
+        band_index = np.searchsorted(self.band_edges, np.nan_to_num(net_worth, nan=-np.inf), side="right")
+        band = self.band_weights[band_index]
+
+        scores = np.minimum(country + pep + sanctions + wealth + occupation + band, self.max_score)
+        levels = self._level(scores)
+
+        results = []
+        for i in range(len(frame)):
+            factors = []
+            if sanctions_hits[i]:
+                hit = sanctions_hits[i]
+                factors.append(f"Sanctions list match: {hit['name']} ({hit['score']:.2f})")
+            if country[i]:
+                factors.append("High-risk jurisdiction")
+            if pep[i]:
+                factors.append("Politically Exposed Person (PEP)")
+            if pep_hits[i] and not declared_pep[i]:
+                hit = pep_hits[i]
+                factors.append(f"PEP list match: {hit['name']} ({hit['score']:.2f})")
+            if band[i]:
+                factors.append(self.band_labels[band_index[i]])
+            if wealth[i]:
+                factors.append(f"Source of wealth: {frame.at[i, 'source_of_wealth']}")
+            if occupation[i]:
+                factors.append(f"Occupation: {frame.at[i, 'occupation']}")
+            score = int(scores[i]) if float(scores[i]).is_integer() else float(scores[i])
+            results.append({
+                "risk_score": score,
+                "risk_level": levels[i],
+                "risk_factors": factors,
+                "recommendation": "Manual review required" if levels[i] != "LOW" else "Approved for onboarding"
+            })
+        return results
+
+    def assess(self, customer: Dict[str, Any], screening: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.assess_batch([customer], [screening])[0]
+
+
+def _best_match(screening: Optional[Dict[str, Any]], category: str) -> Optional[Dict[str, Any]]:
+    matches = [m for m in (screening or {}).get("matches", []) if m.get("category") == category]
+    return max(matches, key=lambda m: m["score"]) if matches else None
+
+
+def assessment_updater(assessment: Dict[str, Any], **fields: Any) -> CaseUpdater:
+    """
+    Case updater that sets ``risk_assessment`` (and ``fields``) on the case as
+    stored at write time, so status or analysis changes made since the case
+    was read are kept.
+    """
+    def apply(case):
+        if case is None:
+            return None  # Deleted meanwhile
+        case.update(fields, risk_assessment=assessment)
+        if case.get("recommendations"):
+            case["recommendations"][0] = assessment["recommendation"]
+        return case
+    return apply
+
+
+def rescore_store(store: CaseStore, engine: RiskEngine, batch_size: int = 10000) -> int:
+    """
+    Re-score every previously scored case (e.g. after a rules or sanctions
+    list change) and save the ones whose assessment changed. Returns the
+    number of updated cases.
+    """
+    updated = 0
+    batch: List[Dict[str, Any]] = []
+
+    def flush():
+        nonlocal updated
+        changed = {}
+        assessments = engine.assess_batch((c["customer_data"] for c in batch), (c.get("screening") for c in batch))
+        for case, assessment in zip(batch, assessments):
+            if case["risk_assessment"] != assessment:
+                changed[case["case_id"]] = assessment_updater(assessment)
+        store.update_many(changed)
+        updated += len(changed)
+        batch.clear()
+
+    for case_id, case in store.items():
+        if not case.get("risk_assessment") or not isinstance(case.get("customer_data"), dict):
+            continue  # Never scored (document-only cases) or legacy records
+        case.setdefault("case_id", case_id)
+        batch.append(case)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return updated
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from app.store import get_case_store
+
+    parser = argparse.ArgumentParser(description="Re-score all KYC cases with the current risk rules")
+    parser.add_argument("--rules", help="Rules JSON (defaults to RISK_RULES_PATH)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    count = rescore_store(get_case_store(), RiskEngine(load_rules(args.rules)))
+    print(f"Updated {count} cases in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,389 @@
+"""
+Sanctions and PEP list screening.
+
+Lists are loaded once into a ``ScreeningIndex`` so an applicant is screened
+with index lookups instead of a scan of every listed name:
+
+* every listed name and alias is normalized (accents, case and punctuation
+  stripped, tokens sorted so "PUTIN, Vladimir" == "Vladimir Putin");
+* an inverted index maps each character trigram to the names containing it.
+  A name whose trigram Jaccard similarity to the query reaches the threshold
+  must share one of the query's ``n - ceil(threshold * n) + 1`` trigrams, so
+  candidates come from the postings of the query's rarest trigrams only, and
+  their overlap with the rest is counted with vectorized binary searches;
+* a phonetic index maps the sorted Soundex codes of a name's tokens to the
+  names with that signature. A phonetic match that also shares some
+  trigrams gets a bounded boost, which catches transliteration variants
+  (Mohammed / Muhammad) whose spelling is too different for trigrams alone
+  once the date of birth or nationality agrees.
+
+Candidates are then scored on the name and adjusted by date of birth and
+nationality when both sides have them.
+
+Lists are CSV (header ``id,name,aliases,date_of_birth,nationality``; aliases
+separated by ``|`` or ``;``) or JSON lines with the same keys. They are named
+by ``SCREENING_LISTS`` as comma-separated ``category:path`` entries, where
+category is ``sanctions`` or ``pep``::
+
+    SCREENING_LISTS=sanctions:lists/ofac.csv,pep:lists/peps.jsonl
+
+``SCREENING_THRESHOLD`` is the minimum match score (default 0.75). The built
+index is pickled to ``SCREENING_INDEX_CACHE`` (default
+``screening_index.pkl``) and reused while the list files are unchanged.
+"""
+import os
+import csv
+import json
+import math
+import pickle
+import hashlib
+import logging
+import unicodedata
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.risk import assessment_updater
+from app.store import CaseStore
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ("sanctions", "pep")
+SOUNDEX_CODES = {
+    c: digit
+    for letters, digit in (("bfpv", "1"), ("cgjkqsxz", "2"), ("dt", "3"), ("l", "4"), ("mn", "5"), ("r", "6"))
+    for c in letters
+}
+# A phonetic-signature match adds PHONETIC_BOOST to the trigram score, up to
+# PHONETIC_MAX, provided the names share at least PHONETIC_MIN_SIMILARITY of
+# their trigrams. PHONETIC_MAX is below the default threshold, so a name that
+# only sounds alike is a hit only when the date of birth or nationality agrees.
+PHONETIC_MIN_SIMILARITY = 0.2
+PHONETIC_BOOST = 0.4
+PHONETIC_MAX = 0.7
+# (entry_id, name, date_of_birth, nationality, category)
+Entry = Tuple[str, str, str, str, str]
+_EMPTY = np.zeros(0, dtype=np.uint32)
+
+
+def normalize_name(name: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    text = "".join(c if c.isalnum() else " " for c in decomposed if not unicodedata.combining(c))
+    return " ".join(sorted(text.lower().split()))
+
+
+def trigrams(normalized: str) -> Set[str]:
+    padded = f" {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def soundex(token: str) -> str:
+    code, last = token[0].upper(), SOUNDEX_CODES.get(token[0], "")
+    for c in token[1:]:
+        digit = SOUNDEX_CODES.get(c, "")
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        if c not in "hw":  # h and w don't separate letters with the same code
+            last = digit
+    return code.ljust(4, "0")
+
+
+def phonetic_signature(normalized: str) -> str:
+    return " ".join(sorted(soundex(token) for token in normalized.split()))
+
+
+def _dob_match(listed: str, given: Optional[str]) -> Optional[str]:
+    """'exact', 'year' or 'mismatch'; None when either side has no date. Listed dates may be a bare year."""
+    if not listed or not given:
+        return None
+    given = given.strip()[:10]
+    if len(listed) >= 10 and listed[:10] == given:
+        return "exact"
+    if listed[:4] == given[:4]:
+        return "year" if len(listed) < 10 else "mismatch"
+    return "mismatch"
+
+
+def _aliases(value: Any) -> List[str]:
+    if isinstance(value, list):
+        return [str(v) for v in value if v]
+    return [a.strip() for a in str(value or "").replace(";", "|").split("|") if a.strip()]
+
+
+def read_list(path: str) -> Iterator[Dict[str, Any]]:
+    """Records of a CSV or JSON-lines list file."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith((".jsonl", ".ndjson", ".json")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def configured_lists(spec: Optional[str] = None) -> List[Tuple[str, str]]:
+    """(category, path) pairs from ``SCREENING_LISTS``."""
+    spec = os.getenv("SCREENING_LISTS", "") if spec is None else spec
+    lists = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        category, sep, path = item.partition(":")
+        if not sep or category not in CATEGORIES:
+            category, path = "sanctions", item
+        lists.append((category, path))
+    return lists
+
+
+def lists_version(lists: List[Tuple[str, str]]) -> str:
+    """Fingerprint of the list files (category, path, size, mtime); changes when any list is updated."""
+    parts = []
+    for category, path in lists:
+        stat = os.stat(path)
+        parts.append(f"{category}:{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class ScreeningIndex:
+    """Listed names compiled into trigram and phonetic inverted indexes."""
+
+    def __init__(self, threshold: float = 0.75, version: str = ""):
+        self.threshold = threshold
+        self.version = version
+        self.entries: List[Entry] = []
+        # One "variant" per listed name or alias
+        self.variant_names: List[str] = []
+        self.variant_entry = array("I")
+        self.variant_sizes = array("H")
+        self.postings: Dict[str, array] = {}
+        self.phonetic: Dict[str, array] = {}
+
+    def add(self, category: str, record: Dict[str, Any]) -> None:
+        name = (record.get("name") or "").strip()
+        if not name:
+            return
+        entry_index = len(self.entries)
+        self.entries.append((
+            str(record.get("id") or f"{category}-{entry_index}"),
+            name,
+            str(record.get("date_of_birth") or "").strip(),
+            str(record.get("nationality") or "").strip().upper(),
+            category,
+        ))
+        seen = set()
+        for variant in [name] + _aliases(record.get("aliases")):
+            normalized = normalize_name(variant)
+            if not normalized or normalized in seen:
+                continue
+            seen.add(normalized)
+            variant_id = len(self.variant_names)
+            grams = trigrams(normalized)
+            self.variant_names.append(normalized)
+            self.variant_entry.append(entry_index)
+            self.variant_sizes.append(min(len(grams), 65535))
+            for gram in grams:
+                self.postings.setdefault(gram, array("I")).append(variant_id)
+            self.phonetic.setdefault(phonetic_signature(normalized), array("I")).append(variant_id)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @classmethod
+    def build(cls, lists: List[Tuple[str, str]], threshold: float = 0.75) -> "ScreeningIndex":
+        index = cls(threshold, lists_version(lists) if lists else "")
+        for category, path in lists:
+            before = len(index)
+            for record in read_list(path):
+                index.add(category, record)
+            logger.info(f"Screening: loaded {len(index) - before} {category} entries from {path}")
+        index._freeze()
+        return index
+
+    @classmethod
+    def from_env(cls) -> "ScreeningIndex":
+        """Index of the ``SCREENING_LISTS`` files, reusing the pickled index while they are unchanged."""
+        lists = configured_lists()
+        threshold = float(os.getenv("SCREENING_THRESHOLD", "0.75"))
+        if not lists:
+            return cls.build([], threshold)
+        cache_path = os.getenv("SCREENING_INDEX_CACHE", "screening_index.pkl")
+        version = lists_version(lists)
+        try:
+            with open(cache_path, "rb") as f:
+                index = pickle.load(f)
+            if isinstance(index, cls) and index.version == version:
+                index.threshold = threshold
+                return index
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable screening index cache {cache_path}: {e}")
+        index = cls.build(lists, threshold)
+        try:
+            tmp_path = f"{cache_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write screening index cache {cache_path}: {e}")
+        return index
+
+    def _freeze(self) -> None:
+        """Convert the build-time arrays to numpy for vectorized lookups."""
+        self.variant_entry = np.asarray(self.variant_entry, dtype=np.uint32)
+        self.variant_sizes = np.asarray(self.variant_sizes, dtype=np.int32)
+        self.postings = {gram: np.asarray(ids, dtype=np.uint32) for gram, ids in self.postings.items()}
+        self.phonetic = {key: np.asarray(ids, dtype=np.uint32) for key, ids in self.phonetic.items()}
+
+    def _name_scores(self, grams: Set[str], signature: str, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Variant ids whose name score reaches ``threshold`` or that match phonetically, and their scores."""
+        n = len(grams)
+        # A name with Jaccard >= threshold shares at least ceil(threshold * n) of the
+        # query's n trigrams, hence at least one of any n - ceil(threshold * n) + 1 of them.
+        prefix = n - math.ceil(threshold * n) + 1
+        ranked = sorted(grams, key=lambda g: len(self.postings.get(g, _EMPTY)))
+        head = [self.postings[g] for g in ranked[:prefix] if g in self.postings]
+        candidates = np.unique(np.concatenate(head)) if head else _EMPTY
+        # ...and has between threshold * n and n / threshold trigrams.
+        sizes = self.variant_sizes[candidates]
+        candidates = candidates[(sizes >= threshold * n) & (sizes <= n / threshold)]
+        phonetic = self.phonetic.get(signature, _EMPTY)
+        candidates = np.union1d(candidates, phonetic)
+        if not len(candidates):
+            return candidates, np.zeros(0)
+
+        # Postings are sorted by variant id, so each overlap count is a binary search.
+        overlap = np.zeros(len(candidates), dtype=np.int32)
+        for gram in grams:
+            postings = self.postings.get(gram)
+            if postings is not None:
+                found = postings[np.minimum(np.searchsorted(postings, candidates), len(postings) - 1)]
+                overlap += found == candidates
+        scores = overlap / (n + self.variant_sizes[candidates] - overlap)
+        boosted = np.isin(candidates, phonetic) & (scores >= PHONETIC_MIN_SIMILARITY)
+        scores = np.where(boosted, np.maximum(scores, np.minimum(scores + PHONETIC_BOOST, PHONETIC_MAX)), scores)
+        # Boosted names are kept below the threshold so that date of birth and
+        # nationality can still confirm them in ``screen``.
+        keep = (scores >= threshold) | boosted
+        return candidates[keep], scores[keep]
+
+    def screen(
+        self,
+        full_name: str,
+        date_of_birth: Optional[str] = None,
+        nationality: Optional[str] = None,
+        limit: int = 5,
+        threshold: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Best-scoring listed entries for a person, highest score first."""
+        threshold = self.threshold if threshold is None else threshold
+        normalized = normalize_name(full_name)
+        if not normalized or not self.entries:
+            return []
+        nationality = (nationality or "").strip().upper()
+
+        best: Dict[int, Dict[str, Any]] = {}
+        variant_ids, name_scores = self._name_scores(trigrams(normalized), phonetic_signature(normalized), threshold)
+        for variant_id, name_score in zip(variant_ids.tolist(), name_scores.tolist()):
+            entry_index = int(self.variant_entry[variant_id])
+            entry_id, name, listed_dob, listed_nationality, category = self.entries[entry_index]
+            score = name_score
+            dob = _dob_match(listed_dob, date_of_birth)
+            score += {"exact": 0.1, "year": 0.05, "mismatch": -0.3, None: 0.0}[dob]
+            if listed_nationality and nationality:
+                score += 0.05 if listed_nationality == nationality else -0.1
+            score = round(max(0.0, min(1.0, score)), 3)
+            if score < threshold or (entry_index in best and best[entry_index]["score"] >= score):
+                continue
+            best[entry_index] = {
+                "entry_id": entry_id,
+                "category": category,
+                "name": name,
+                "matched_name": self.variant_names[variant_id],
+                "score": score,
+                "name_score": round(name_score, 3),
+                "date_of_birth_match": dob,
+                "nationality": listed_nationality or None,
+            }
+        return sorted(best.values(), key=lambda m: m["score"], reverse=True)[:limit]
+
+    def screen_customer(self, customer: Dict[str, Any]) -> Dict[str, Any]:
+        """Screening result stored on a case as ``screening``."""
+        matches = self.screen(
+            customer.get("full_name") or "",
+            customer.get("date_of_birth"),
+            customer.get("nationality") or customer.get("citizenship"),
+        )
+        return {"lists_version": self.version, "matches": matches}
+
+    def screen_batch(self, customers: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [self.screen_customer(customer) for customer in customers]
+
+
+def screen_store(store: CaseStore, index: ScreeningIndex, engine, batch_size: int = 10000) -> int:
+    """
+    Re-screen every scored case against ``index`` (e.g. after a list update),
+    re-score it with ``engine`` and save the cases whose screening or risk
+    assessment changed. Only those fields are merged into each stored case.
+    Returns the number of updated cases.
+    """
+    updated = 0
+    batch: List[Dict[str, Any]] = []
+
+    def flush():
+        nonlocal updated
+        changed = {}
+        screenings = index.screen_batch(c["customer_data"] for c in batch)
+        assessments = engine.assess_batch((c["customer_data"] for c in batch), screenings)
+        for case, screening, assessment in zip(batch, screenings, assessments):
+            if case.get("screening") != screening or case["risk_assessment"] != assessment:
+                changed[case["case_id"]] = assessment_updater(assessment, screening=screening)
+        store.update_many(changed)
+        updated += len(changed)
+        batch.clear()
+
+    for case_id, case in store.items():
+        if not case.get("risk_assessment") or not isinstance(case.get("customer_data"), dict):
+            continue  # Never scored (document-only cases) or legacy records
+        case.setdefault("case_id", case_id)
+        batch.append(case)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return updated
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Sanctions/PEP screening")
+    sub = parser.add_subparsers(dest="command", required=True)
+    search = sub.add_parser("search", help="Screen one name")
+    search.add_argument("name")
+    search.add_argument("--dob")
+    search.add_argument("--nationality")
+    sub.add_parser("store", help="Re-screen and re-score every case in the store")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    screening_index = ScreeningIndex.from_env()
+    print(f"Index of {len(screening_index)} entries ready in {time.perf_counter() - started:.2f}s")
+    if args.command == "search":
+        started = time.perf_counter()
+        for match in screening_index.screen(args.name, args.dob, args.nationality):
+            print(json.dumps(match))
+        print(f"Screened in {(time.perf_counter() - started) * 1000:.2f}ms")
+    else:
+        from app.risk import RiskEngine
+        from app.store import get_case_store
+
+        started = time.perf_counter()
+        count = screen_store(get_case_store(), screening_index, RiskEngine.from_env())
+        print(f"Updated {count} cases in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,578 @@
+"""
+Case persistence backends.
+
+The original store kept every case in a single ``kyc_cases.json`` that was
+parsed and rewritten on every save. The backends here give O(1) point reads
+and writes by ``case_id`` and atomic per-case updates:
+
+* ``SQLiteCaseStore`` - embedded SQLite database in WAL mode (default).
+* ``LogCaseStore``    - append-only JSON-lines log with an in-memory offset index.
+
+Use ``get_case_store()`` to build the backend selected by ``CASE_STORE_BACKEND``
+and ``migrate_json_store()`` (or ``python -m app.store migrate``) to import an
+existing ``kyc_cases.json``.
+"""
+import os
+import json
+import base64
+import bisect
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CaseUpdater = Callable[[Optional[Dict[str, Any]]], Optional[Dict[str, Any]]]
+# (timestamp, case_id) - listing order key, newest first
+SortKey = Tuple[str, str]
+# Cases read per query by SQLiteCaseStore.items()
+ITEMS_BATCH_SIZE = 500
+
+
+def index_fields(data: Dict[str, Any]) -> Tuple[str, str, str]:
+    """Extract the secondary index columns (status, risk level, timestamp) of a case."""
+    risk = data.get("risk_assessment") or {}
+    return (
+        data.get("status") or "",
+        (risk.get("risk_level") or "") if isinstance(risk, dict) else "",
+        data.get("timestamp") or "",
+    )
+
+
+@contextmanager
+def file_lock(path: str, exclusive: bool = True):
+    """Advisory ``flock`` on ``path`` (created if missing); a no-op where flock is unavailable."""
+    with open(path, "ab") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def encode_cursor(key: SortKey) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> SortKey:
+    try:
+        timestamp, case_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(timestamp), str(case_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class CaseQuery:
+    """Filters and page bounds for ``CaseStore.query``."""
+
+    def __init__(
+        self,
+        status: Optional[str] = None,
+        risk_level: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+    ):
+        self.status = status
+        self.risk_level = risk_level
+        self.since = since
+        # A bare date as the upper bound includes the whole day.
+        self.until = until + "T23:59:59.999999" if until and len(until) == 10 else until
+        self.after = decode_cursor(cursor) if cursor else None
+        self.limit = limit
+
+    def matches(self, status: str, risk_level: str, key: SortKey) -> bool:
+        if self.status is not None and status != self.status:
+            return False
+        if self.risk_level is not None and risk_level != self.risk_level:
+            return False
+        if self.since is not None and key[0] < self.since:
+            return False
+        if self.until is not None and key[0] > self.until:
+            return False
+        return self.after is None or key < self.after
+
+
+class CaseStore:
+    """Interface shared by all case store backends."""
+
+    def get(self, case_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def put(self, case_id: str, data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def update(self, case_id: str, updater: CaseUpdater) -> Optional[Dict[str, Any]]:
+        """
+        Atomically read-modify-write a single case.
+
+        ``updater`` receives the current case (or None) and returns the new
+        case; returning None leaves the stored case untouched.
+        """
+        raise NotImplementedError
+
+    def delete(self, case_id: str) -> bool:
+        raise NotImplementedError
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        raise NotImplementedError
+
+    def query(self, query: CaseQuery) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Return one page of cases matching ``query``, newest first, plus the
+        cursor for the next page (None on the last page).
+        """
+        raise NotImplementedError
+
+    def put_many(self, cases: Dict[str, Dict[str, Any]]) -> None:
+        for case_id, data in cases.items():
+            self.put(case_id, data)
+
+    def update_many(self, updaters: Dict[str, CaseUpdater]) -> None:
+        """Apply ``update`` to several cases; backends do it in one write transaction."""
+        for case_id, updater in updaters.items():
+            self.update(case_id, updater)
+
+    def values(self) -> Iterator[Dict[str, Any]]:
+        for _, data in self.items():
+            yield data
+
+    def count(self) -> int:
+        return sum(1 for _ in self.items())
+
+    def __contains__(self, case_id: str) -> bool:
+        return self.get(case_id) is not None
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteCaseStore(CaseStore):
+    """SQLite (WAL) backed store. Safe across threads and processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute("PRAGMA journal_mode=WAL")
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cases ("
+                " case_id TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " updated_at REAL NOT NULL DEFAULT (julianday('now'))"
+                ")"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(cases)")}
+            if "status" not in columns:
+                # Secondary index columns, backfilled for stores created before listing filters.
+                for column in ("status", "risk_level", "timestamp"):
+                    conn.execute(f"ALTER TABLE cases ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+                for case_id, data in conn.execute("SELECT case_id, data FROM cases").fetchall():
+                    conn.execute(
+                        "UPDATE cases SET status = ?, risk_level = ?, timestamp = ? WHERE case_id = ?",
+                        (*index_fields(json.loads(data)), case_id),
+                    )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cases_ts ON cases (timestamp, case_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cases_status ON cases (status, timestamp, case_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cases_risk ON cases (risk_level, timestamp, case_id)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _connect(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def get(self, case_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT data FROM cases WHERE case_id = ?", (case_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, conn: sqlite3.Connection, case_id: str, data: Dict[str, Any]) -> None:
+        conn.execute(
+            "INSERT INTO cases (case_id, data, status, risk_level, timestamp, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, julianday('now'))"
+            " ON CONFLICT(case_id) DO UPDATE SET data = excluded.data, status = excluded.status,"
+            " risk_level = excluded.risk_level, timestamp = excluded.timestamp,"
+            " updated_at = excluded.updated_at",
+            (case_id, json.dumps(data), *index_fields(data)),
+        )
+
+    def put(self, case_id: str, data: Dict[str, Any]) -> None:
+        with self._connect() as conn:
+            self._write(conn, case_id, data)
+
+    def put_many(self, cases: Dict[str, Dict[str, Any]]) -> None:
+        with self._connect() as conn:
+            for case_id, data in cases.items():
+                self._write(conn, case_id, data)
+
+    def update(self, case_id: str, updater: CaseUpdater) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            return self._update(conn, case_id, updater)
+
+    def update_many(self, updaters: Dict[str, CaseUpdater]) -> None:
+        with self._connect() as conn:
+            for case_id, updater in updaters.items():
+                self._update(conn, case_id, updater)
+
+    def _update(self, conn: sqlite3.Connection, case_id: str, updater: CaseUpdater) -> Optional[Dict[str, Any]]:
+        row = conn.execute(
+            "SELECT data FROM cases WHERE case_id = ?", (case_id,)
+        ).fetchone()
+        current = json.loads(row[0]) if row else None
+        new = updater(current)
+        if new is None:
+            return current
+        self._write(conn, case_id, new)
+        return new
+
+    def delete(self, case_id: str) -> bool:
+        with self._connect() as conn:
+            cur = conn.execute("DELETE FROM cases WHERE case_id = ?", (case_id,))
+            return cur.rowcount > 0
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        # Keyset batches on the primary key: bounded memory, and no read
+        # transaction held open while the caller works through the cases.
+        last = ""
+        while True:
+            rows = self._conn().execute(
+                "SELECT case_id, data FROM cases WHERE case_id > ? ORDER BY case_id LIMIT ?",
+                (last, ITEMS_BATCH_SIZE),
+            ).fetchall()
+            for case_id, data in rows:
+                yield case_id, json.loads(data)
+            if len(rows) < ITEMS_BATCH_SIZE:
+                return
+            last = rows[-1][0]
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM cases").fetchone()[0]
+
+    def query(self, query: CaseQuery) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        clauses, params = [], []
+        if query.status is not None:
+            clauses.append("status = ?")
+            params.append(query.status)
+        if query.risk_level is not None:
+            clauses.append("risk_level = ?")
+            params.append(query.risk_level)
+        if query.since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(query.since)
+        if query.until is not None:
+            clauses.append("timestamp <= ?")
+            params.append(query.until)
+        if query.after is not None:
+            clauses.append("(timestamp, case_id) < (?, ?)")
+            params.extend(query.after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn().execute(
+            f"SELECT case_id, timestamp, data FROM cases {where}"
+            " ORDER BY timestamp DESC, case_id DESC LIMIT ?",
+            (*params, query.limit + 1),
+        ).fetchall()
+        page = rows[:query.limit]
+        next_cursor = encode_cursor((page[-1][1], page[-1][0])) if len(rows) > query.limit else None
+        return [json.loads(data) for _, _, data in page], next_cursor
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class LogCaseStore(CaseStore):
+    """
+    Append-only log store.
+
+    Every write appends one JSON line ``{"id", "op", "data"}`` to the log and
+    records its byte offset in an in-memory index, so reads are a single seek.
+    The index is rebuilt by scanning the log on open and caught up from the
+    last known offset before each operation, which lets several processes
+    share one log (appends are serialized with ``flock`` where available).
+    Superseded records are reclaimed by ``compact()``.
+
+    Listing filters are served from in-memory secondary indexes: sorted
+    ``(timestamp, case_id)`` lists of every case, of each status and of each
+    risk level. A page is read by bisecting the most selective list at the
+    cursor and walking it backwards.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._fields: Dict[str, Tuple[str, str, str]] = {}
+        self._by_status: Dict[str, List[SortKey]] = {}
+        self._by_risk: Dict[str, List[SortKey]] = {}
+        self._order: List[SortKey] = []
+        self._end = 0
+        self._inode = None
+        open(self.path, "ab").close()
+        with self._lock:
+            self._catch_up()
+
+    def _file_lock(self, exclusive: bool = True):
+        return file_lock(self.path + ".lock", exclusive)
+
+    def _catch_up(self) -> None:
+        """Index any records appended since the last scan (by us or other processes)."""
+        inode = os.stat(self.path).st_ino
+        if inode != self._inode:
+            # First scan, or the log was compacted (replaced) by another process.
+            self._index.clear()
+            self._fields.clear()
+            self._by_status.clear()
+            self._by_risk.clear()
+            self._order.clear()
+            self._end = 0
+            self._inode = inode
+        with open(self.path, "rb") as f:
+            f.seek(self._end)
+            offset = self._end
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Partial trailing write; picked up on the next scan.
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.error(f"Skipping corrupt case log record at offset {offset}")
+                    offset += len(line)
+                    continue
+                if record.get("op") == "del":
+                    self._unindex(record["id"])
+                else:
+                    self._reindex(record["id"], (offset, len(line)), record["data"])
+                offset += len(line)
+            self._end = offset
+
+    def _unindex(self, case_id: str) -> None:
+        self._index.pop(case_id, None)
+        fields = self._fields.pop(case_id, None)
+        if fields is None:
+            return
+        status, risk_level, timestamp = fields
+        for order in (self._by_status.get(status), self._by_risk.get(risk_level), self._order):
+            if order is not None:
+                position = bisect.bisect_left(order, (timestamp, case_id))
+                if position < len(order) and order[position] == (timestamp, case_id):
+                    del order[position]
+
+    def _reindex(self, case_id: str, location: Tuple[int, int], data: Dict[str, Any]) -> None:
+        fields = index_fields(data)
+        if self._fields.get(case_id) != fields:
+            self._unindex(case_id)
+            status, risk_level, timestamp = fields
+            self._fields[case_id] = fields
+            bisect.insort(self._by_status.setdefault(status, []), (timestamp, case_id))
+            bisect.insort(self._by_risk.setdefault(risk_level, []), (timestamp, case_id))
+            bisect.insort(self._order, (timestamp, case_id))
+        self._index[case_id] = location
+
+    def _read_at(self, location: Tuple[int, int]) -> Dict[str, Any]:
+        offset, length = location
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.read(length))["data"]
+
+    def _append(self, records) -> None:
+        with open(self.path, "ab") as f:
+            for record in records:
+                line = (json.dumps(record) + "\n").encode("utf-8")
+                offset = f.tell()
+                f.write(line)
+                if record["op"] == "del":
+                    self._unindex(record["id"])
+                else:
+                    self._reindex(record["id"], (offset, len(line)), record["data"])
+            f.flush()
+            os.fsync(f.fileno())
+            self._end = f.tell()
+
+    def get(self, case_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock, self._file_lock(exclusive=False):
+            self._catch_up()
+            location = self._index.get(case_id)
+            return self._read_at(location) if location else None
+
+    def put(self, case_id: str, data: Dict[str, Any]) -> None:
+        self.put_many({case_id: data})
+
+    def put_many(self, cases: Dict[str, Dict[str, Any]]) -> None:
+        with self._lock, self._file_lock():
+            self._catch_up()
+            self._append({"id": case_id, "op": "put", "data": data} for case_id, data in cases.items())
+
+    def update(self, case_id: str, updater: CaseUpdater) -> Optional[Dict[str, Any]]:
+        with self._lock, self._file_lock():
+            self._catch_up()
+            location = self._index.get(case_id)
+            current = self._read_at(location) if location else None
+            new = updater(current)
+            if new is None:
+                return current
+            self._append([{"id": case_id, "op": "put", "data": new}])
+            return new
+
+    def update_many(self, updaters: Dict[str, CaseUpdater]) -> None:
+        with self._lock, self._file_lock():
+            self._catch_up()
+            records = []
+            for case_id, updater in updaters.items():
+                location = self._index.get(case_id)
+                new = updater(self._read_at(location) if location else None)
+                if new is not None:
+                    records.append({"id": case_id, "op": "put", "data": new})
+            self._append(records)
+
+    def delete(self, case_id: str) -> bool:
+        with self._lock, self._file_lock():
+            self._catch_up()
+            if case_id not in self._index:
+                return False
+            self._append([{"id": case_id, "op": "del"}])
+            return True
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        with self._lock, self._file_lock(exclusive=False):
+            self._catch_up()
+            snapshot = sorted(self._index.items())
+        for case_id, location in snapshot:
+            yield case_id, self._read_at(location)
+
+    def count(self) -> int:
+        with self._lock, self._file_lock(exclusive=False):
+            self._catch_up()
+            return len(self._index)
+
+    def _candidates(self, query: CaseQuery) -> Iterator[SortKey]:
+        """Yield sort keys newest first, walking the smallest index that covers the filters."""
+        orders = [self._order]
+        if query.status is not None:
+            orders.append(self._by_status.get(query.status, []))
+        if query.risk_level is not None:
+            orders.append(self._by_risk.get(query.risk_level, []))
+        order = min(orders, key=len)
+        # Walk backwards from the upper bound; query.matches() checks the other filter.
+        upper = len(order)
+        if query.after is not None:
+            upper = bisect.bisect_left(order, query.after)
+        if query.until is not None:
+            upper = min(upper, bisect.bisect_right(order, (query.until, "\uffff")))
+        for position in range(upper - 1, -1, -1):
+            key = order[position]
+            if query.since is not None and key[0] < query.since:
+                return
+            yield key
+
+    def query(self, query: CaseQuery) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        with self._lock, self._file_lock(exclusive=False):
+            self._catch_up()
+            keys: List[SortKey] = []
+            for key in self._candidates(query):
+                status, risk_level, _ = self._fields[key[1]]
+                if query.matches(status, risk_level, key):
+                    keys.append(key)
+                    if len(keys) > query.limit:
+                        break
+            page = [self._read_at(self._index[case_id]) for _, case_id in keys[:query.limit]]
+        next_cursor = encode_cursor(keys[query.limit - 1]) if len(keys) > query.limit else None
+        return page, next_cursor
+
+    def compact(self) -> None:
+        """Rewrite the log keeping only the latest record of each live case."""
+        with self._lock, self._file_lock():
+            self._catch_up()
+            tmp_path = self.path + ".compact"
+            index: Dict[str, Tuple[int, int]] = {}
+            with open(self.path, "rb") as src, open(tmp_path, "wb") as dst:
+                for case_id, (offset, length) in sorted(self._index.items(), key=lambda kv: kv[1][0]):
+                    src.seek(offset)
+                    index[case_id] = (dst.tell(), length)
+                    dst.write(src.read(length))
+                dst.flush()
+                os.fsync(dst.fileno())
+                end = dst.tell()
+            os.replace(tmp_path, self.path)
+            self._index = index
+            self._end = end
+            self._inode = os.stat(self.path).st_ino
+
+
+def get_case_store(backend: Optional[str] = None, path: Optional[str] = None) -> CaseStore:
+    """Build the case store selected by ``CASE_STORE_BACKEND`` (sqlite or log)."""
+    backend = (backend or os.getenv("CASE_STORE_BACKEND", "sqlite")).lower()
+    if backend == "sqlite":
+        return SQLiteCaseStore(path or os.getenv("CASE_STORE_PATH", "kyc_cases.db"))
+    if backend == "log":
+        return LogCaseStore(path or os.getenv("CASE_STORE_PATH", "kyc_cases.log"))
+    raise ValueError(f"Unknown case store backend: {backend}")
+
+
+def migrate_json_store(json_path: str, store: CaseStore, overwrite: bool = False) -> int:
+    """
+    One-shot import of a legacy ``kyc_cases.json`` into ``store``.
+
+    Existing cases are kept unless ``overwrite`` is set. Returns the number
+    of cases written. Several API workers starting together import it once.
+    """
+    if not os.path.exists(json_path):
+        return 0
+    with file_lock(json_path + ".lock"):
+        with open(json_path, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+        if not overwrite:
+            legacy = {case_id: data for case_id, data in legacy.items() if case_id not in store}
+        store.put_many(legacy)
+    logger.info(f"Migrated {len(legacy)} cases from {json_path}")
+    return len(legacy)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="KYC case store maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="Import a legacy kyc_cases.json")
+    migrate.add_argument("json_path", nargs="?", default="kyc_cases.json")
+    migrate.add_argument("--backend")
+    migrate.add_argument("--path")
+    migrate.add_argument("--overwrite", action="store_true")
+    compact = sub.add_parser("compact", help="Compact an append-only log store")
+    compact.add_argument("--path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "migrate":
+        count = migrate_json_store(args.json_path, get_case_store(args.backend, args.path), args.overwrite)
+        print(f"Imported {count} cases")
+    elif args.command == "compact":
+        get_case_store("log", args.path).compact()
@@ -0,0 +1,193 @@
+"""
+Streaming upload handling.
+
+Uploaded files are copied to disk in chunks with ``aiofiles`` so large scans
+never block the event loop. Each file is SHA-256 hashed while it is written
+and the per-file size limit is enforced as bytes arrive. The content itself
+is stored once in the blob store (``app.blobs``) under its sha256 and
+hard-linked into the case directory, so identical documents (a re-uploaded
+passport, or the same file sent twice) share one copy on disk.
+
+``UPLOAD_MAX_MB`` bounds what is written to disk per file, not what the
+server accepts: Starlette has already spooled the multipart body before the
+handler runs, so cap the request body at the proxy (e.g. nginx
+``client_max_body_size``) to bound ingress. When one file of a request is
+over the limit, the other saves are cancelled and every file the request
+linked into the case directory is removed. Complete blobs stay in the blob
+store, which may already share them with other cases.
+"""
+import os
+import shutil
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+import aiofiles
+from fastapi import HTTPException, UploadFile
+
+from app.blobs import BlobStore
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(float(os.getenv("UPLOAD_MAX_MB", "25")) * 1024 * 1024)
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def _link_or_copy(src: str, dest: str) -> None:
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file on disk, for files recorded before uploads were hashed."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _upload_name(file: UploadFile) -> str:
+    return os.path.basename(file.filename or "") or "upload"
+
+
+def stored_names(files: List[UploadFile]) -> List[str]:
+    """Names to store the files under in one case directory: the upload's own name, suffixed when it repeats."""
+    names, used = [], set()
+    for file in files:
+        name = _upload_name(file)
+        stem, ext = os.path.splitext(name)
+        n = 1
+        while name in used:
+            n += 1
+            name = f"{stem}-{n}{ext}"
+        used.add(name)
+        names.append(name)
+    return names
+
+
+async def save_upload(
+    file: UploadFile,
+    case_dir: str,
+    blobs: BlobStore,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    stored_name: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Stream one upload into the blob store and link it into ``case_dir`` (as ``stored_name`` if given)."""
+    filename = _upload_name(file)
+    tmp_path = blobs.staging_path()
+    file_path = None
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"{filename} exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+                digest.update(chunk)
+                await out.write(chunk)
+
+        sha256 = digest.hexdigest()
+        dest = os.path.join(case_dir, stored_name or filename)
+
+        def store():
+            blobs.put(tmp_path, sha256)
+            _link_or_copy(blobs.local_path(sha256), dest)
+
+        # The thread can't be interrupted, so on cancellation wait for it and then undo the link.
+        stored = asyncio.ensure_future(asyncio.to_thread(store))
+        try:
+            await asyncio.shield(stored)
+        except asyncio.CancelledError:
+            await asyncio.wait([stored])
+            if not stored.cancelled() and stored.exception() is None:
+                file_path = dest
+            raise
+        file_path = dest
+    except BaseException:
+        await asyncio.to_thread(_remove_quietly, tmp_path)
+        if file_path is not None:
+            await asyncio.to_thread(_remove_quietly, file_path)
+        raise
+    finally:
+        await file.close()
+
+    return {"filename": filename, "path": os.path.abspath(file_path), "sha256": sha256, "size": size}
+
+
+async def save_uploads(files: List[UploadFile], case_dir: str, blobs: BlobStore) -> List[Dict[str, Any]]:
+    """
+    Save all files of one multipart request concurrently. Files with identical
+    content are returned once; different files sent under the same name are
+    stored under distinct names. Raises HTTP 413 if any file is over the limit;
+    if any save fails, the others are cancelled and their files removed.
+    """
+    os.makedirs(case_dir, exist_ok=True)
+    names = stored_names(files)
+    tasks: List[asyncio.Task] = []
+    try:
+        async with asyncio.TaskGroup() as group:
+            tasks = [
+                group.create_task(save_upload(f, case_dir, blobs, stored_name=name))
+                for f, name in zip(files, names)
+            ]
+    except BaseException as e:
+        # Unfinished saves were cancelled and cleaned up after themselves; remove the finished ones.
+        for task in tasks:
+            if task.done() and not task.cancelled() and task.exception() is None:
+                await asyncio.to_thread(_remove_quietly, task.result()["path"])
+        if not isinstance(e, BaseExceptionGroup):
+            raise
+        too_large = e.subgroup(UploadTooLarge)
+        if too_large is not None:
+            raise HTTPException(status_code=413, detail=str(too_large.exceptions[0]))
+        raise e.exceptions[0]
+    saved = [task.result() for task in tasks]
+
+    documents, seen = [], set()
+    for document in saved:
+        if document["sha256"] in seen:
+            logger.info(f"Skipping duplicate upload {document['filename']}")
+            if document["path"] not in seen:
+                os.remove(document["path"])
+            continue
+        seen.update((document["sha256"], document["path"]))
+        documents.append(document)
+    return documents
+
+
+def materialize_documents(case: Dict[str, Any], blobs: BlobStore) -> int:
+    """
+    Make sure every document of ``case`` exists at its recorded path on this
+    machine, linking it from the blob store where it is missing (e.g. the
+    upload was received by another node). Returns the number of files restored.
+    """
+    restored = 0
+    for document in case.get("documents") or []:
+        path, sha256 = document.get("path"), document.get("sha256")
+        if not path or not sha256 or os.path.exists(path):
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _link_or_copy(blobs.local_path(sha256), path)
+        restored += 1
+    return restored
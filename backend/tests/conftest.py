@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The backend is imported as the top-level ``app`` package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,30 @@
+import pytest
+
+from app.screening import ScreeningIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "sanctions.csv"
+    path.write_text(
+        "id,name,aliases,date_of_birth,nationality\n"
+        "S1,Mario Garza,,1970-03-14,MX\n"
+        "S2,Muhammad Ali,,1965-07-01,SY\n"
+    )
+    return ScreeningIndex.build([("sanctions", str(path))])
+
+
+def test_exact_name_is_a_hit(index):
+    assert [m["entry_id"] for m in index.screen("GARZA, Mario")] == ["S1"]
+
+
+@pytest.mark.parametrize("name", ["Mary Gross", "Maria Garcia"])
+def test_phonetic_near_miss_is_not_a_hit(index, name):
+    assert index.screen(name) == []
+    assert index.screen(name, date_of_birth="1988-01-02", nationality="GB") == []
+
+
+def test_phonetic_variant_is_a_hit_when_date_of_birth_agrees(index):
+    assert index.screen("Mohammed Ali") == []
+    matches = index.screen("Mohammed Ali", date_of_birth="1965-07-01")
+    assert [m["entry_id"] for m in matches] == ["S2"]
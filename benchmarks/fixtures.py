@@ -0,0 +1,141 @@
+"""
+Synthetic KYC documents for benchmarks.
+
+Passport images carry a machine-readable zone with valid ICAO 9303 check
+digits; PDFs are multi-page scans of such documents. Everything is drawn
+with Pillow, so fixtures are generated on demand instead of checked in.
+"""
+import os
+import random
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".fixtures")
+
+SURNAMES = ["ERIKSSON", "OKAFOR", "NAKAMURA", "GARCIA", "MULLER", "PATEL", "KOWALSKI", "DUBOIS"]
+GIVEN_NAMES = ["ANNA", "JAMES", "YUKI", "MARIA", "LUKAS", "PRIYA", "JAN", "CLAIRE"]
+COUNTRIES = ["UTO", "GBR", "DEU", "FRA", "JPN", "NGA", "IND", "POL"]
+
+
+def check_digit(field: str) -> str:
+    """ICAO 9303 check digit (weights 7, 3, 1; A-Z = 10-35; filler = 0)."""
+    total = 0
+    for i, char in enumerate(field):
+        if char.isdigit():
+            value = int(char)
+        elif char.isalpha():
+            value = ord(char.upper()) - 55
+        else:
+            value = 0
+        total += value * (7, 3, 1)[i % 3]
+    return str(total % 10)
+
+
+def mrz_lines(
+    surname: str,
+    given_names: str,
+    document_number: str,
+    nationality: str,
+    birth: date,
+    sex: str,
+    expiry: date,
+    issuing_country: Optional[str] = None,
+    personal_number: str = "",
+) -> List[str]:
+    """The two 44-character lines of a TD3 (passport) machine-readable zone."""
+    names = f"{surname}<<{given_names.replace(' ', '<')}"
+    line1 = f"P<{issuing_country or nationality}{names}".ljust(44, "<")[:44]
+    number = document_number.ljust(9, "<")[:9]
+    dob = birth.strftime("%y%m%d")
+    exp = expiry.strftime("%y%m%d")
+    personal = personal_number.ljust(14, "<")[:14]
+    composite = number + check_digit(number) + dob + check_digit(dob) + exp + check_digit(exp) + personal + check_digit(personal)
+    line2 = (
+        f"{number}{check_digit(number)}{nationality}{dob}{check_digit(dob)}{sex}"
+        f"{exp}{check_digit(exp)}{personal}{check_digit(personal)}{check_digit(composite)}"
+    )
+    return [line1, line2]
+
+
+def random_identity(rng: random.Random) -> Dict[str, object]:
+    country = rng.choice(COUNTRIES)
+    birth = date(1950, 1, 1) + timedelta(days=rng.randrange(365 * 55))
+    return {
+        "surname": rng.choice(SURNAMES),
+        "given_names": rng.choice(GIVEN_NAMES),
+        "document_number": f"{rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ')}{rng.randrange(10**7, 10**8)}",
+        "nationality": country,
+        "birth": birth,
+        "sex": rng.choice("MF"),
+        "expiry": date.today() + timedelta(days=rng.randrange(30, 3650)),
+    }
+
+
+def _font(size: int):
+    for name in ("DejaVuSansMono.ttf", "LiberationMono-Regular.ttf", "Courier New.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def passport_image(identity: Dict[str, object], size=(1600, 1100)) -> Image.Image:
+    """Draw a passport data page with visual fields, a photo box and the MRZ."""
+    width, height = size
+    img = Image.new("RGB", size, (236, 232, 220))
+    draw = ImageDraw.Draw(img)
+    label, value, mrz = _font(26), _font(36), _font(44)
+
+    draw.rectangle([40, 40, width - 40, height - 40], outline=(90, 90, 110), width=4)
+    draw.text((80, 70), f"PASSPORT / {identity['nationality']}", fill=(30, 40, 90), font=value)
+    draw.rectangle([80, 170, 460, 640], fill=(200, 200, 205), outline=(120, 120, 130), width=3)
+
+    fields = [
+        ("Surname", identity["surname"]),
+        ("Given names", identity["given_names"]),
+        ("Passport No.", identity["document_number"]),
+        ("Nationality", identity["nationality"]),
+        ("Date of birth", identity["birth"].strftime("%d %b %Y").upper()),
+        ("Sex", identity["sex"]),
+        ("Date of expiry", identity["expiry"].strftime("%d %b %Y").upper()),
+    ]
+    y = 170
+    for name, text in fields:
+        draw.text((520, y), name, fill=(90, 90, 90), font=label)
+        draw.text((520, y + 30), str(text), fill=(10, 10, 10), font=value)
+        y += 78
+
+    lines = mrz_lines(**identity)
+    draw.rectangle([40, height - 240, width - 40, height - 40], fill=(245, 245, 240))
+    for i, line in enumerate(lines):
+        draw.text((80, height - 210 + i * 80), line, fill=(0, 0, 0), font=mrz)
+    return img
+
+
+def passport_fixture(seed: int = 0, directory: str = FIXTURE_DIR) -> str:
+    """Path to a synthetic passport JPEG, generated on first use."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"passport_{seed}.jpg")
+    if not os.path.exists(path):
+        passport_image(random_identity(random.Random(seed))).save(path, "JPEG", quality=90)
+    return path
+
+
+def pdf_fixture(pages: int, seed: int = 0, directory: str = FIXTURE_DIR) -> str:
+    """Path to a synthetic scanned PDF with ``pages`` passport pages, generated on first use."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"document_{pages}p_{seed}.pdf")
+    if not os.path.exists(path):
+        rng = random.Random(seed)
+        images = [passport_image(random_identity(rng)) for _ in range(pages)]
+        images[0].save(path, "PDF", resolution=150, save_all=True, append_images=images[1:])
+    return path
+
+
+if __name__ == "__main__":
+    print(passport_fixture())
+    for count in (1, 5, 20):
+        print(pdf_fixture(count))
@@ -0,0 +1,224 @@
+"""
+Local stand-in for the Ollama endpoints used by the crew.
+
+Serves ``POST /api/generate`` (the vision OCR call), ``POST
+/v1/chat/completions`` (the OpenAI-compatible endpoint the agent LLM uses)
+and ``GET /api/tags``. Every request can be delayed and made to fail, so the
+pipeline can be benchmarked offline and under degraded conditions.
+
+    python benchmarks/mock_ollama.py --port 11435 --latency 0.4 --jitter 0.1 --fail-rate 0.05
+
+Then point the crew at it with ``OLLAMA_BASE_URL=http://127.0.0.1:11435/v1``.
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+OCR_TEXT = (
+    "PASSPORT\n"
+    "Type: P  Country code: UTO  Passport No.: L898902C3\n"
+    "Surname: ERIKSSON\nGiven names: ANNA MARIA\n"
+    "Nationality: UTOPIAN\nDate of birth: 12 AUG 1974\nSex: F\n"
+    "Date of expiry: 15 APR 2032\n"
+    "P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<\n"
+    "L898902C36UTO7408122F3204153ZE184226B<<<<<16"
+)
+
+EXTRACTION = {
+    "document_type": {"value": "passport", "confidence": 0.95},
+    "full_name": {"value": "Anna Maria Eriksson", "confidence": 0.93},
+    "date_of_birth": {"value": "1974-08-12", "confidence": 0.9},
+    "nationality": {"value": "Utopian", "confidence": 0.9},
+    "document_number": {"value": "L898902C3", "confidence": 0.92},
+    "issuing_country": {"value": "UTO", "confidence": 0.9},
+    "expiry_date": {"value": "2032-04-15", "confidence": 0.9},
+    "summary": "Synthetic passport returned by the benchmark mock.",
+}
+
+PATH_PATTERN = re.compile(r"(/[^\s'\"]+\.(?:pdf|jpe?g|png|bmp|webp))", re.IGNORECASE)
+
+
+class MockSettings:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, fail_rate: float = 0.0, fail_status: int = 503):
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.requests = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        return max(0.0, random.gauss(self.latency, self.jitter) if self.jitter else self.latency)
+
+    def should_fail(self) -> bool:
+        failed = random.random() < self.fail_rate
+        with self._lock:
+            self.requests += 1
+            self.failures += failed
+        return failed
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+def chat_completion(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Play the agent's side of a one-tool ReAct loop: ask for the OCR tool on
+    the first turn, then return the extraction once an observation is present.
+    Handles both native tool calling and crewai's text ReAct format.
+    """
+    messages: List[Dict[str, Any]] = body.get("messages") or []
+    transcript = "\n".join(_message_text(m) for m in messages)
+    # Any earlier assistant/tool turn means the tool has run (crewai's own prompt
+    # already mentions "Observation:", so the text alone can't tell).
+    observed = any(m.get("role") in ("assistant", "tool") for m in messages)
+    match = PATH_PATTERN.search(transcript)
+    arguments = json.dumps({"file_path": match.group(1) if match else ""})
+
+    message: Dict[str, Any] = {"role": "assistant"}
+    finish_reason = "stop"
+    if observed:
+        message["content"] = f"Thought: I now know the final answer\nFinal Answer: {json.dumps(EXTRACTION)}"
+    elif body.get("tools"):
+        name = body["tools"][0].get("function", {}).get("name", "document_ocr_tool")
+        message["content"] = None
+        message["tool_calls"] = [
+            {"id": "call_0", "type": "function", "function": {"name": name, "arguments": arguments}}
+        ]
+        finish_reason = "tool_calls"
+    else:
+        message["content"] = (
+            "Thought: I need to read the document\n"
+            f"Action: document_ocr_tool\nAction Input: {arguments}"
+        )
+    prompt_tokens = len(transcript) // 4
+    return {
+        "id": f"chatcmpl-{random.getrandbits(32):x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 120, "total_tokens": prompt_tokens + 120},
+    }
+
+
+def generate(body: Dict[str, Any]) -> Dict[str, Any]:
+    image_bytes = sum(len(image) for image in body.get("images") or []) * 3 // 4
+    return {
+        "model": body.get("model", "mock"),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "response": OCR_TEXT,
+        "done": True,
+        # Rough stand-in for image tokens so token metrics move with payload size
+        "prompt_eval_count": 64 + image_bytes // 1024,
+        "eval_count": len(OCR_TEXT) // 4,
+    }
+
+
+def make_handler(settings: MockSettings):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, payload: Dict[str, Any]) -> None:
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _inject(self) -> bool:
+            time.sleep(settings.delay())
+            if settings.should_fail():
+                self._send(settings.fail_status, {"error": "injected failure"})
+                return True
+            return False
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/api/tags":
+                self._send(200, {"models": [{"name": "mock-vision"}, {"name": "mock-chat"}]})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self._send(400, {"error": "invalid JSON"})
+                return
+            path = self.path.rstrip("/")
+            if path == "/api/generate":
+                if not self._inject():
+                    self._send(200, generate(body))
+            elif path in ("/v1/chat/completions", "/chat/completions"):
+                if not self._inject():
+                    self._send(200, chat_completion(body))
+            else:
+                self._send(404, {"error": "not found"})
+
+    return Handler
+
+
+class MockOllama:
+    """Run the mock server on a background thread: ``with MockOllama(latency=0.2) as url: ...``."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **settings):
+        self.settings = MockSettings(**settings)
+        self.server = ThreadingHTTPServer((host, port), make_handler(self.settings))
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> str:
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.0, help="mean seconds added to every model call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="standard deviation of the added latency")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of model calls that fail")
+    parser.add_argument("--fail-status", type=int, default=503, help="HTTP status returned by failed calls")
+    args = parser.parse_args()
+
+    mock = MockOllama(
+        args.host, args.port,
+        latency=args.latency, jitter=args.jitter, fail_rate=args.fail_rate, fail_status=args.fail_status,
+    )
+    print(f"Mock Ollama listening on {mock.url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,489 @@
+#!/usr/bin/env python
+"""
+KYC benchmark runner.
+
+Scenarios:
+    upload   POST /kyc/upload-docs with synthetic passport scans
+    process  POST /kyc/process, one case per request, and /kyc/process/bulk
+    store    case store get/query/update latency as the store grows (sqlite and log)
+    ocr      DocumentOcrTool fan-out over 1/5/20-page PDFs against the mock Ollama
+    startup  cold import time of the API and crew CLI modules, checked against a budget
+
+The API scenarios run the app in-process (FastAPI TestClient) against a
+throwaway data directory, or against a running server with ``--base-url``.
+Run them from ``backend/``'s environment; run ``ocr`` from ``kycagents/``'s
+(``uv run python ../benchmarks/run.py ocr``). Scenarios whose dependencies are
+missing are skipped.
+
+    python benchmarks/run.py upload process --requests 200 --concurrency 8
+    python benchmarks/run.py --save-baseline
+    python benchmarks/run.py --compare --tolerance 0.15
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+sys.path.insert(0, BENCH_DIR)
+
+from fixtures import passport_fixture, pdf_fixture  # noqa: E402
+from mock_ollama import MockOllama  # noqa: E402
+
+Result = Dict[str, Any]
+
+# ISO 3166 alpha-2 codes, as matched by the risk rules; IR, SY and RU are in the
+# default high-risk list, so the jurisdiction rule is exercised.
+NATIONALITIES = ["GB", "DE", "IR", "JP", "NG", "IN", "SY", "FR", "RU"]
+
+
+class ScenarioSkipped(Exception):
+    pass
+
+
+# --- Measurement ---
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(name: str, latencies: List[float], wall: float, errors: int = 0, units: int = 0) -> Result:
+    """Latency percentiles (ms) and throughput (``units`` per second, default one per call)."""
+    values = sorted(latencies)
+    return {
+        "name": name,
+        "count": len(values),
+        "errors": errors,
+        "throughput": round((units or len(values)) / wall, 2) if wall else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+    }
+
+
+def measure(name: str, call: Callable[[int], Any], count: int, concurrency: int = 1) -> Result:
+    """Run ``call(i)`` ``count`` times over ``concurrency`` threads; a call that raises counts as an error."""
+    latencies: List[float] = []
+    errors = 0
+
+    def timed(i: int):
+        started = time.perf_counter()
+        try:
+            call(i)
+            return time.perf_counter() - started, False
+        except Exception:
+            return time.perf_counter() - started, True
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency, failed in executor.map(timed, range(count)):
+            latencies.append(latency)
+            errors += failed
+    return summarize(name, latencies, time.perf_counter() - started, errors)
+
+
+def check(response) -> None:
+    if response.status_code >= 400:
+        raise RuntimeError(f"HTTP {response.status_code}")
+
+
+def customer(rng: random.Random, i: int) -> Dict[str, Any]:
+    return {
+        "customer_data": {
+            "full_name": f"Bench Customer {i}",
+            "date_of_birth": f"19{rng.randrange(40, 99)}-0{rng.randrange(1, 9)}-1{rng.randrange(0, 9)}",
+            "nationality": rng.choice(NATIONALITIES),
+            "email": f"bench{i}@example.com",
+            "occupation": "Engineer",
+            "net_worth": rng.choice([None, 50_000, 750_000, 2_000_000, 25_000_000]),
+            "is_pep": rng.random() < 0.05,
+        },
+        "priority": rng.choice(["standard", "high", "urgent"]),
+    }
+
+
+# --- API client ---
+
+_client = None
+
+
+def api_client(args):
+    """A ``requests`` session against ``--base-url``, or the app in-process over TestClient."""
+    global _client
+    if _client is not None:
+        return _client
+    if args.base_url:
+        import requests
+
+        class BaseUrlSession(requests.Session):
+            def request(self, method, url, *a, **kw):
+                return super().request(method, args.base_url.rstrip("/") + url, *a, **kw)
+
+        _client = BaseUrlSession()
+        return _client
+
+    try:
+        from fastapi.testclient import TestClient
+    except ImportError as e:
+        raise ScenarioSkipped(f"backend dependencies not installed ({e})")
+    # Keep the benchmark's cases, jobs, events and uploads out of the real data directory.
+    workdir = tempfile.mkdtemp(prefix="kyc-bench-")
+    os.environ.update({
+        "CASE_STORE_PATH": os.path.join(workdir, "kyc_cases.db"),
+        "JOB_QUEUE_PATH": os.path.join(workdir, "kyc_jobs.db"),
+        "KYC_EVENTS_DB": os.path.join(workdir, "kyc_events.db"),
+        "CREW_LOG_DIR": os.path.join(workdir, "crew_logs"),
+    })
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+    from app.main import app
+
+    _client = TestClient(app)
+    return _client
+
+
+# --- Scenarios ---
+
+def scenario_upload(args) -> List[Result]:
+    client = api_client(args)
+    files = [passport_fixture(seed) for seed in range(3)]
+    payloads = {path: open(path, "rb").read() for path in files}
+
+    def upload(i: int):
+        chosen = files[: 1 + i % len(files)]
+        response = client.post(
+            "/kyc/upload-docs",
+            data={"full_name": f"Bench Upload {i}", "priority": "standard"},
+            files=[("files", (f"{i}-{os.path.basename(p)}", payloads[p], "image/jpeg")) for p in chosen],
+        )
+        check(response)
+
+    return [measure("upload", upload, args.requests, args.concurrency)]
+
+
+def scenario_process(args) -> List[Result]:
+    client = api_client(args)
+    rng = random.Random(args.seed)
+    requests_ = [customer(rng, i) for i in range(args.requests)]
+
+    results = [measure(
+        "process",
+        lambda i: check(client.post("/kyc/process", json=requests_[i])),
+        args.requests,
+        args.concurrency,
+    )]
+
+    batch = "\n".join(json.dumps(customer(rng, i)) for i in range(args.bulk_size)).encode("utf-8")
+    # TestClient (httpx) takes a raw body as content=, requests as data=
+    body = {"data": batch} if args.base_url else {"content": batch}
+    result = measure(
+        "process.bulk",
+        lambda i: check(client.post(
+            "/kyc/process/bulk", headers={"Content-Type": "application/x-ndjson"}, **body
+        )),
+        max(1, args.requests // 50),
+    )
+    # Report bulk throughput in records per second
+    result["throughput"] = round(result["throughput"] * args.bulk_size, 2)
+    results.append(result)
+    return results
+
+
+def synthetic_case(rng: random.Random, i: int, start: datetime) -> Dict[str, Any]:
+    return {
+        "case_id": f"BENCH-{i:08d}",
+        "status": rng.choice(["completed", "pending_review", "queued", "failed"]),
+        "customer_data": customer(rng, i)["customer_data"],
+        "risk_assessment": {"risk_level": rng.choice(["LOW", "MEDIUM", "HIGH"]), "risk_score": rng.randrange(100)},
+        "analysis_results": {"documents": [], "agent_notes": "benchmark"},
+        "timestamp": (start + timedelta(seconds=i)).isoformat(),
+    }
+
+
+def scenario_store(args) -> List[Result]:
+    sys.path.insert(0, BACKEND_DIR)
+    try:
+        from app.store import CaseQuery, get_case_store
+    except ImportError as e:
+        raise ScenarioSkipped(f"backend dependencies not installed ({e})")
+
+    results = []
+    rng = random.Random(args.seed)
+    start = datetime(2025, 1, 1)
+    for backend in ("sqlite", "log"):
+        for size in args.store_sizes:
+            workdir = tempfile.mkdtemp(prefix="kyc-bench-store-")
+            store = get_case_store(backend, os.path.join(workdir, f"cases.{backend}"))
+            ids = [f"BENCH-{i:08d}" for i in range(size)]
+            prefix = f"store.{backend}.{size}"
+
+            insert_started = time.perf_counter()
+            latencies = []
+            for offset in range(0, size, 1000):
+                batch = {ids[i]: synthetic_case(rng, i, start) for i in range(offset, min(offset + 1000, size))}
+                batch_started = time.perf_counter()
+                store.put_many(batch)
+                latencies.append(time.perf_counter() - batch_started)
+            results.append(summarize(f"{prefix}.put_many", latencies, time.perf_counter() - insert_started, units=size))
+
+            results.append(measure(f"{prefix}.get", lambda i: store.get(rng.choice(ids)), args.requests))
+            results.append(measure(
+                f"{prefix}.query",
+                lambda i: store.query(CaseQuery(status="completed", risk_level="HIGH", limit=50)),
+                max(10, args.requests // 5),
+            ))
+
+            def bump(case):
+                case["analysis_results"]["agent_notes"] = "updated"
+                return case
+
+            results.append(measure(f"{prefix}.update", lambda i: store.update(rng.choice(ids), bump), args.requests))
+            store.close()
+    return results
+
+
+def scenario_ocr(args) -> List[Result]:
+    try:
+        from kycagents.tools.ocr_tool import DocumentOcrTool
+    except ImportError as e:
+        raise ScenarioSkipped(f"kycagents dependencies not installed ({e})")
+
+    results = []
+    with MockOllama(latency=args.mock_latency, jitter=args.mock_jitter, fail_rate=args.mock_fail_rate) as url:
+        os.environ.update({"OLLAMA_BASE_URL": url, "OLLAMA_API_KEY": "benchmark", "OCR_CACHE_ENABLED": "0"})
+        for pages in args.pdf_pages:
+            path = pdf_fixture(pages, seed=args.seed)
+            for in_flight in args.in_flight:
+                tool = DocumentOcrTool(max_in_flight=in_flight)
+                result = measure(f"ocr.{pages}p.in_flight_{in_flight}", lambda i: tool._run(path), args.ocr_runs)
+                # Pages per second across all runs
+                result["throughput"] = round(result["throughput"] * pages, 2)
+                results.append(result)
+    return results
+
+
+# Import-time budgets (ms, median of --startup-runs fresh interpreters) for the
+# modules every API pod and per-case ``run_crew`` process loads at start-up.
+STARTUP_BUDGETS_MS = {
+    "app.main": 1500.0,
+    "kycagents.main": 250.0,
+    "kycagents.crew": 8000.0,
+}
+
+
+def import_time(module: str, cwd: str, env: Dict[str, str]) -> Tuple[float, float, List[Tuple[float, str]]]:
+    """
+    Import ``module`` in a fresh interpreter under ``-X importtime``. Returns
+    the process wall time (s), the module's cumulative import time (s) and the
+    slowest top-level imports beneath it as (ms, name).
+    """
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise ImportError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}")
+    total = 0.0
+    children: List[Tuple[float, str]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # Header line
+        if name.strip() == module:
+            total = int(cumulative) / 1e6
+        elif name.startswith("   ") and not name.startswith("    "):
+            children.append((int(cumulative) / 1000, name.strip()))
+    return wall, total, sorted(children, reverse=True)[:5]
+
+
+def scenario_startup(args) -> List[Result]:
+    budgets = dict(STARTUP_BUDGETS_MS)
+    for item in args.startup_budget or []:
+        module, _, limit = item.partition("=")
+        budgets[module] = float(limit)
+
+    workdir = tempfile.mkdtemp(prefix="kyc-bench-startup-")
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": os.pathsep.join(filter(None, [BACKEND_DIR, os.path.join(ROOT_DIR, "kycagents", "src"), env.get("PYTHONPATH")])),
+        "CASE_STORE_PATH": os.path.join(workdir, "kyc_cases.db"),
+        "JOB_QUEUE_PATH": os.path.join(workdir, "kyc_jobs.db"),
+        "KYC_EVENTS_DB": os.path.join(workdir, "kyc_events.db"),
+        "IDENTITY_INDEX_PATH": os.path.join(workdir, "kyc_identity.db"),
+        "CREW_LOG_DIR": os.path.join(workdir, "crew_logs"),
+    })
+    results = []
+    for module, budget in budgets.items():
+        latencies = []
+        imports: List[Tuple[float, List[Tuple[float, str]]]] = []
+        started = time.perf_counter()
+        try:
+            for _ in range(args.startup_runs):
+                wall, total, slowest = import_time(module, workdir, env)
+                latencies.append(wall)
+                imports.append((total, slowest))
+        except ImportError as e:
+            print(f"Skipping startup.{module}: {e}", file=sys.stderr)
+            continue
+        result = summarize(f"startup.{module}", latencies, time.perf_counter() - started)
+        total, slowest = sorted(imports)[len(imports) // 2]  # Median run
+        result["import_ms"] = round(total * 1000, 3)
+        result["budget_ms"] = budget
+        result["slowest_imports"] = [f"{name} {ms:.0f}ms" for ms, name in slowest]
+        results.append(result)
+    if not results:
+        raise ScenarioSkipped("none of the startup modules can be imported in this environment")
+    return results
+
+
+SCENARIOS: Dict[str, Callable[[Any], List[Result]]] = {
+    "upload": scenario_upload,
+    "process": scenario_process,
+    "store": scenario_store,
+    "ocr": scenario_ocr,
+    "startup": scenario_startup,
+}
+
+
+# --- Reporting ---
+
+def print_results(results: List[Result], baseline: Optional[Dict[str, Result]] = None) -> None:
+    header = f"{'scenario':<34} {'n':>6} {'err':>4} {'thru/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}"
+    if baseline is not None:
+        header += f" {'p95 Δ':>8} {'thru Δ':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        line = (
+            f"{r['name']:<34} {r['count']:>6} {r['errors']:>4} {r['throughput']:>10} "
+            f"{r['p50_ms']:>10} {r['p95_ms']:>10} {r['p99_ms']:>10}"
+        )
+        base = (baseline or {}).get(r["name"])
+        if base:
+            line += f" {_change(r['p95_ms'], base['p95_ms']):>8} {_change(r['throughput'], base['throughput']):>8}"
+        print(line)
+
+
+def _change(value: float, base: float) -> str:
+    return f"{(value - base) / base * 100:+.1f}%" if base else "n/a"
+
+
+def regressions(results: List[Result], baseline: Dict[str, Result], tolerance: float) -> List[str]:
+    """Scenarios whose p95 grew or throughput fell by more than ``tolerance`` against the baseline."""
+    found = []
+    for r in results:
+        base = baseline.get(r["name"])
+        if not base:
+            continue
+        if base["p95_ms"] and r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            found.append(f"{r['name']}: p95 {base['p95_ms']} -> {r['p95_ms']} ms")
+        if base["throughput"] and r["throughput"] < base["throughput"] * (1 - tolerance):
+            found.append(f"{r['name']}: throughput {base['throughput']} -> {r['throughput']}/s")
+    return found
+
+
+def over_budget(results: List[Result]) -> List[str]:
+    """Startup results whose median import time exceeds their budget."""
+    return [
+        f"{r['name']}: import {r['import_ms']} ms > budget {r['budget_ms']} ms ({', '.join(r['slowest_imports'])})"
+        for r in results
+        if "budget_ms" in r and r["import_ms"] > r["budget_ms"]
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--base-url", help="benchmark a running API instead of the in-process app")
+    parser.add_argument("--requests", type=int, default=100, help="calls per API/store measurement")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--bulk-size", type=int, default=1000, help="records per /kyc/process/bulk request")
+    parser.add_argument("--store-sizes", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--pdf-pages", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--in-flight", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--ocr-runs", type=int, default=3, help="OCR runs per document and in-flight setting")
+    parser.add_argument("--mock-latency", type=float, default=0.25, help="mean seconds per mock model call")
+    parser.add_argument("--mock-jitter", type=float, default=0.05)
+    parser.add_argument("--mock-fail-rate", type=float, default=0.0)
+    parser.add_argument("--startup-runs", type=int, default=5, help="fresh interpreters per startup module")
+    parser.add_argument("--startup-budget", action="append", metavar="MODULE=MS",
+                        help="override an import-time budget (repeatable); exit 1 if exceeded")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="compare against the baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression for --compare")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results: List[Result] = []
+    for name in args.scenarios or list(SCENARIOS):
+        try:
+            results.extend(SCENARIOS[name](args))
+        except ScenarioSkipped as e:
+            print(f"Skipping {name}: {e}", file=sys.stderr)
+
+    baseline = None
+    if args.compare:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = {r["name"]: r for r in json.load(f)["results"]}
+    print_results(results, baseline)
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "save_baseline", "compare")},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        if args.scenarios and os.path.exists(args.baseline):
+            # Only replace the scenarios that were run
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+            names = {r["name"] for r in results}
+            report["results"] = [r for r in previous["results"] if r["name"] not in names] + results
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    found = over_budget(results)
+    for line in found:
+        print(f"OVER BUDGET {line}")
+    if baseline is not None:
+        regressed = regressions(results, baseline, args.tolerance)
+        for line in regressed:
+            print(f"REGRESSION {line}")
+        found += regressed
+    sys.exit(1 if found else 0)
+
+
+if __name__ == "__main__":
+    main()
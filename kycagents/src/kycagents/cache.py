@@ -0,0 +1,96 @@
+"""
+Persistent text cache shared by the OCR and LLM response caches.
+
+A local SQLite (WAL) table of text entries capped at ``max_bytes``: least
+recently used entries are evicted first, and entries older than the TTL
+(0 = never) are treated as misses. Hit/miss/eviction counters are persisted
+alongside the entries so any process can report them.
+"""
+import time
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+
+class TextCache:
+    def __init__(self, path: str, table: str, max_bytes: int, ttl: float = 0):
+        self.path = path
+        self.table = table
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            " key TEXT PRIMARY KEY,"
+            " text TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL"
+            ")"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_lru ON {table} (accessed_at)")
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table}_stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _bump(self, name: str, amount: int = 1) -> None:
+        self._conn.execute(
+            f"INSERT INTO {self.table}_stats (name, value) VALUES (?, ?)"
+            " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[str]:
+        """Cached text for ``key``; ``ttl`` overrides the cache-wide TTL for this lookup."""
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            row = self._conn.execute(f"SELECT text, created_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is not None and ttl and now - row[1] > ttl:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._bump("evictions")
+                row = None
+            if row is None:
+                self._bump("misses")
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            self._bump("hits")
+            return row[0]
+
+    def put(self, key: str, text: str) -> None:
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, text, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, text, size, now, now),
+                )
+                self._evict()
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _evict(self) -> None:
+        total = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute(f"SELECT key, size FROM {self.table} ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        self._bump("evictions", evicted)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counters = {"hits": 0, "misses": 0, "evictions": 0}
+            counters.update(dict(self._conn.execute(f"SELECT name, value FROM {self.table}_stats").fetchall()))
+            entries, size = self._conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+            counters.update(entries=entries, bytes=size)
+            return counters
@@ -1,14 +1,43 @@
 import os
+import functools
 from dotenv import load_dotenv
-from crewai import Agent, Crew, Process, Task, LLM
+from crewai import Agent, Crew, Process, Task
+from crewai.llms.base_llm import BaseLLM
 from crewai.project import CrewBase, agent, crew, task
 from crewai.agents.agent_builder.base_agent import BaseAgent
 from typing import List
 
 load_dotenv()
 
+from kycagents.failover_llm import FailoverLLM
+from kycagents.http_client import get_http_client
+from kycagents.llm_cache import cached_llm
+from kycagents.results import ExtractedDocument
 from kycagents.tools.ocr_tool import DocumentOcrTool
 
+
+def document_kind(file_path: str) -> str:
+    """Route a file to the "pdf" or "image" OCR agent by its extension."""
+    return "pdf" if os.path.splitext(file_path)[1].lower() == ".pdf" else "image"
+
+
+@functools.lru_cache(maxsize=None)
+def crew_llm() -> BaseLLM:
+    """
+    The agents' LLM, built when the first agent is rather than when this
+    module is imported, then shared by every crew in the process (its usage
+    counters accumulate; see ``telemetry.record_token_usage``). Each call picks
+    its endpoint through the OCR tool's HTTP client, so it shares the retry
+    settings, circuit breakers and failover order.
+    """
+    return FailoverLLM(
+        get_http_client(),
+        model=os.getenv("MODEL", "openai/rnj-1:8b"),
+        api_key=os.getenv("OLLAMA_API_KEY"),
+        temperature=0.7,
+    )
+
+
 @CrewBase
 class Kycagents():
     """Kycagents crew"""
@@ -16,19 +45,12 @@ class Kycagents():
     agents: List[BaseAgent]
     tasks: List[Task]
 
-    llm = LLM(
-        model=os.getenv("MODEL", "openai/rnj-1:8b"),
-        base_url=os.getenv("OLLAMA_BASE_URL", "https://ollama.com/v1"),
-        api_key=os.getenv("OLLAMA_API_KEY"),
-        temperature=0.7
-    )
-
     @agent
     def pdf_ocr_agent(self) -> Agent:
         return Agent(
             config=self.agents_config['pdf_ocr_agent'], # type: ignore[index]
             verbose=True,
-            llm=self.llm,
+            llm=cached_llm(crew_llm(), "pdf_ocr_task"),
             tools=[DocumentOcrTool()]
         )
 
@@ -37,7 +59,7 @@ class Kycagents():
         return Agent(
             config=self.agents_config['image_ocr_agent'], # type: ignore[index]
             verbose=True,
-            llm=self.llm,
+            llm=cached_llm(crew_llm(), "image_ocr_task"),
             tools=[DocumentOcrTool()]
         )
 
@@ -45,12 +67,27 @@ class Kycagents():
     def pdf_ocr_task(self) -> Task:
         return Task(
             config=self.tasks_config['pdf_ocr_task'], # type: ignore[index]
+            output_pydantic=ExtractedDocument,
         )
 
     @task
     def image_ocr_task(self) -> Task:
         return Task(
             config=self.tasks_config['image_ocr_task'], # type: ignore[index]
+            output_pydantic=ExtractedDocument,
+        )
+
+    def document_crew(self, kind: str) -> Crew:
+        """Creates a crew running only the OCR agent and task for one document kind ("pdf" or "image")"""
+        if kind == "pdf":
+            agent, task = self.pdf_ocr_agent(), self.pdf_ocr_task()
+        else:
+            agent, task = self.image_ocr_agent(), self.image_ocr_task()
+        return Crew(
+            agents=[agent],
+            tasks=[task],
+            process=Process.sequential,
+            verbose=True,
         )
 
     @crew
@@ -0,0 +1,153 @@
+"""
+Endpoint failover for the crew's LLM calls.
+
+``FailoverLLM`` keeps one crew ``LLM`` per model endpoint of the shared
+``ResilientClient`` and picks the endpoint per call, through the same circuit
+breakers the OCR tool's vision calls use. Connection errors, timeouts and 5xx
+responses count against the endpoint's circuit and the call is retried on the
+next healthy endpoint with the client's jittered backoff; a 429 is retried
+without counting against the circuit. Other errors (bad request, context
+length, ...) are raised straight away.
+"""
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from crewai import LLM
+from crewai.llms.base_llm import BaseLLM
+from crewai.types.usage_metrics import UsageMetrics
+
+from kycagents import telemetry
+from kycagents.http_client import RETRY_STATUSES, CircuitOpenError, Endpoint, ResilientClient
+
+logger = logging.getLogger(__name__)
+
+
+def _failure_kind(error: Exception) -> Optional[str]:
+    """"failure" if ``error`` says the endpoint is unhealthy, "busy" for rate limiting, None if retrying won't help."""
+    status = getattr(error, "status_code", None)
+    if status == 429:
+        return "busy"
+    if status in RETRY_STATUSES or status == 408 or isinstance(error, (ConnectionError, TimeoutError)):
+        return "failure"
+    return None
+
+
+class FailoverLLM(BaseLLM):
+    """Delegates each call to the LLM of the first endpoint whose circuit allows it."""
+
+    def __init__(self, client: ResilientClient, model: str, api_key: Optional[str] = None, temperature: Optional[float] = None):
+        self.client = client
+        # Retries happen here, across endpoints, rather than inside each endpoint's LLM.
+        self._llms: Dict[str, LLM] = {
+            endpoint.url: LLM(
+                model=model,
+                base_url=f"{endpoint.url}/v1",
+                api_key=api_key,
+                temperature=temperature,
+                timeout=client.read_timeout,
+                max_retries=0,
+            )
+            for endpoint in client.endpoints
+        }
+        self._primary = self._llms[client.endpoints[0].url]
+        super().__init__(
+            model=model,
+            temperature=temperature,
+            api_key=api_key,
+            base_url=self._primary.base_url,
+            stop=list(self._primary.stop or []),
+        )
+
+    # Agents set their stop words on the LLM they are given; keep them on every endpoint's LLM.
+    @property
+    def stop(self) -> List[str]:
+        return self._primary.stop
+
+    @stop.setter
+    def stop(self, value: List[str]) -> None:
+        for llm in self._llms.values():
+            llm.stop = value
+
+    def _pick(self, tried: List[Endpoint]) -> Endpoint:
+        endpoint = self.client._pick(tried)
+        if endpoint is None:
+            raise CircuitOpenError(f"All model endpoints are unavailable: {[e.url for e in self.client.endpoints]}")
+        if endpoint not in tried:
+            tried.append(endpoint)
+        return endpoint
+
+    def _record(self, endpoint: Endpoint, error: Exception, attempt: int) -> float:
+        """Record a failed attempt on ``endpoint``; re-raise ``error`` if it is final, else return the retry delay."""
+        kind = _failure_kind(error)
+        if kind == "failure":
+            endpoint.breaker.record_failure()
+        else:
+            endpoint.breaker.release()
+        if kind is None or attempt == self.client.max_retries:
+            raise error
+        delay = self.client._delay(attempt, None)
+        telemetry.record("kyc_model_http_retries_total", 1, reason=type(error).__name__)
+        logger.warning(f"LLM call to {endpoint.url} failed ({type(error).__name__}), retry {attempt + 1} in {delay:.2f}s")
+        return delay
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        tried: List[Endpoint] = []
+        for attempt in range(self.client.max_retries + 1):
+            endpoint = self._pick(tried)
+            try:
+                response = self._llms[endpoint.url].call(
+                    messages, tools=tools, callbacks=callbacks, available_functions=available_functions, **kwargs
+                )
+            except Exception as e:
+                time.sleep(self._record(endpoint, e, attempt))
+                continue
+            except BaseException:
+                endpoint.breaker.release()
+                raise
+            endpoint.breaker.record_success()
+            return response
+        raise AssertionError("unreachable")
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        tried: List[Endpoint] = []
+        for attempt in range(self.client.max_retries + 1):
+            endpoint = self._pick(tried)
+            try:
+                response = await self._llms[endpoint.url].acall(
+                    messages, tools=tools, callbacks=callbacks, available_functions=available_functions, **kwargs
+                )
+            except Exception as e:
+                await asyncio.sleep(self._record(endpoint, e, attempt))
+                continue
+            except BaseException:
+                endpoint.breaker.release()
+                raise
+            endpoint.breaker.record_success()
+            return response
+        raise AssertionError("unreachable")
+
+    def supports_function_calling(self) -> bool:
+        return self._primary.supports_function_calling()
+
+    def supports_stop_words(self) -> bool:
+        return self._primary.supports_stop_words()
+
+    def get_context_window_size(self) -> int:
+        return self._primary.get_context_window_size()
+
+    def supports_multimodal(self) -> bool:
+        return self._primary.supports_multimodal()
+
+    def get_token_usage_summary(self) -> UsageMetrics:
+        usage = UsageMetrics()
+        for llm in self._llms.values():
+            usage.add_usage_metrics(llm.get_token_usage_summary())
+        return usage
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for attributes the wrapper doesn't define itself.
+        if name in ("_llms", "_primary"):
+            raise AttributeError(name)
+        return getattr(self._primary, name)
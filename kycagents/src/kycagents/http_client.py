@@ -0,0 +1,221 @@
+"""
+Shared HTTP client for the model backends.
+
+One keep-alive connection pool per process, with connect/read timeouts,
+jittered exponential retry on 429/5xx and connection errors, and a circuit
+breaker per endpoint. When ``OLLAMA_FALLBACK_URLS`` lists extra endpoints,
+calls fail over to the next endpoint whose circuit is closed. The OCR tool
+sends its vision calls through ``ResilientClient.post``. The crew LLM picks
+its endpoint per call through the same breakers (see ``failover_llm``).
+
+Configuration (environment):
+    OLLAMA_BASE_URL         primary endpoint (default https://ollama.com)
+    OLLAMA_FALLBACK_URLS    comma-separated fallback endpoints, in order
+    HTTP_POOL_SIZE          connections kept per endpoint (default 10)
+    HTTP_CONNECT_TIMEOUT    seconds (default 10)
+    HTTP_READ_TIMEOUT       seconds (default 120)
+    HTTP_MAX_RETRIES        retries after the first attempt (default 3)
+    HTTP_BACKOFF_BASE       first retry delay in seconds (default 0.5)
+    HTTP_BACKOFF_MAX        retry delay cap in seconds (default 20)
+    HTTP_BREAKER_THRESHOLD  consecutive failures that open an endpoint's circuit (default 5)
+    HTTP_BREAKER_RESET      seconds before an open circuit lets a trial call through (default 30)
+"""
+import os
+import time
+import random
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from kycagents import telemetry
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+Timeout = Union[float, Tuple[float, float]]
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Every endpoint's circuit is open; the call was not attempted."""
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. ``threshold`` consecutive failures open it.
+    Open: calls are refused until ``reset_timeout`` has passed. After that the
+    circuit is half-open and lets one trial call through; success closes the
+    circuit, failure re-opens it.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def release(self) -> None:
+        """End a call that neither proves nor disproves the endpoint's health (a 429, an unexpected error)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class Endpoint:
+    def __init__(self, url: str, breaker: CircuitBreaker):
+        # Stored without the OpenAI-compatible /v1 suffix; see FailoverLLM
+        self.url = url.rstrip("/").removesuffix("/v1")
+        self.breaker = breaker
+
+
+class ResilientClient:
+    def __init__(
+        self,
+        base_urls: List[str],
+        pool_size: int = 10,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 120.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        breaker_threshold: int = 5,
+        breaker_reset: float = 30.0,
+    ):
+        if not base_urls:
+            raise ValueError("At least one endpoint URL is required")
+        self.endpoints = [Endpoint(url, CircuitBreaker(breaker_threshold, breaker_reset)) for url in base_urls]
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints), pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _pick(self, tried: List[Endpoint]) -> Optional[Endpoint]:
+        """First endpoint (in configured order) whose circuit allows a call, preferring ones not yet tried."""
+        for candidates in ([e for e in self.endpoints if e not in tried], tried):
+            for endpoint in candidates:
+                if endpoint.breaker.allow():
+                    return endpoint
+        return None
+
+    def _delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        # Full jitter keeps concurrent pages from retrying in lockstep.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def post(
+        self,
+        path: str,
+        json: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[Timeout] = None,
+    ) -> requests.Response:
+        """
+        POST ``path`` to the first healthy endpoint, retrying and failing over
+        on 429/5xx and connection errors. Returns the last response (which may
+        still be an error status) or raises the last connection error.
+        """
+        timeout = timeout or (self.connect_timeout, self.read_timeout)
+        tried: List[Endpoint] = []
+        for attempt in range(self.max_retries + 1):
+            endpoint = self._pick(tried)
+            if endpoint is None:
+                raise CircuitOpenError(f"All model endpoints are unavailable: {[e.url for e in self.endpoints]}")
+            if endpoint not in tried:
+                tried.append(endpoint)
+
+            response, error = None, None
+            try:
+                response = self.session.post(f"{endpoint.url}{path}", json=json, headers=headers, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            except BaseException:
+                # Don't leave a half-open circuit waiting on a trial that will never report back.
+                endpoint.breaker.release()
+                raise
+
+            if error is None and response.status_code not in RETRY_STATUSES:
+                endpoint.breaker.record_success()
+                return response
+            # Rate limiting means the endpoint is up but busy, so it doesn't count against the circuit.
+            if error is None and response.status_code == 429:
+                endpoint.breaker.release()
+            else:
+                endpoint.breaker.record_failure()
+            reason = type(error).__name__ if error is not None else str(response.status_code)
+            if attempt == self.max_retries:
+                if error is not None:
+                    raise error
+                return response
+            delay = self._delay(attempt, response)
+            telemetry.record("kyc_model_http_retries_total", 1, reason=reason)
+            logger.warning(f"Model call to {endpoint.url}{path} failed ({reason}), retry {attempt + 1} in {delay:.2f}s")
+            time.sleep(delay)
+        raise AssertionError("unreachable")
+
+
+def model_endpoints() -> List[str]:
+    urls = [os.getenv("OLLAMA_BASE_URL", "https://ollama.com")]
+    urls += [u.strip() for u in os.getenv("OLLAMA_FALLBACK_URLS", "").split(",") if u.strip()]
+    return urls
+
+
+_client: Optional[ResilientClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> ResilientClient:
+    """The process-wide client, built from the environment on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ResilientClient(
+                model_endpoints(),
+                pool_size=int(os.getenv("HTTP_POOL_SIZE", "10")),
+                connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "10")),
+                read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", "120")),
+                max_retries=int(os.getenv("HTTP_MAX_RETRIES", "3")),
+                backoff_base=float(os.getenv("HTTP_BACKOFF_BASE", "0.5")),
+                backoff_max=float(os.getenv("HTTP_BACKOFF_MAX", "20")),
+                breaker_threshold=int(os.getenv("HTTP_BREAKER_THRESHOLD", "5")),
+                breaker_reset=float(os.getenv("HTTP_BREAKER_RESET", "30")),
+            )
+        return _client
@@ -0,0 +1,191 @@
+"""
+Response cache for the crew's LLM calls.
+
+``CachedLLM`` wraps the crew ``LLM`` and answers a call from a local
+persistent cache when the same model has already seen the same normalized
+conversation (messages, tools and stop words) for the same task. Re-analysing
+a case, a job retry or a duplicate submission then skips the LLM reasoning
+steps entirely. Combined with the OCR cache, the tool observations are also
+identical on a re-run.
+
+Which tasks are cached, and for how long, is set per task in
+``config/llm_cache.yaml``.
+
+Configuration (environment):
+    LLM_CACHE_ENABLED   0 disables the cache for every task (default 1)
+    LLM_CACHE_PATH      SQLite file (default llm_cache.db)
+    LLM_CACHE_MAX_MB    size cap; least recently used entries are evicted (default 128)
+    LLM_CACHE_BYPASS    1 always calls the LLM and refreshes the cached answer,
+                        e.g. for audits that need a fresh model decision (default 0)
+"""
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import yaml
+from crewai.llms.base_llm import BaseLLM
+
+from kycagents import telemetry
+from kycagents.cache import TextCache
+
+logger = logging.getLogger(__name__)
+
+POLICY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "llm_cache.yaml")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() not in ("0", "false", "no")
+
+
+def _normalize(content: Any) -> Any:
+    if isinstance(content, str):
+        return _WHITESPACE.sub(" ", content).strip()
+    if isinstance(content, list):
+        return [_normalize(part) for part in content]
+    if isinstance(content, dict):
+        return {k: _normalize(v) for k, v in content.items()}
+    return content
+
+
+def llm_cache_key(model: str, namespace: str, messages: Any, tools: Any = None, stop: Optional[List[str]] = None) -> str:
+    """Hash of the model, task and whitespace-normalized conversation."""
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    payload = {
+        "model": model,
+        "namespace": namespace,
+        "messages": [{"role": m.get("role"), "content": _normalize(m.get("content"))} for m in messages],
+        "tools": tools or [],
+        "stop": sorted(stop or []),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class CachedLLM(BaseLLM):
+    """Delegates to ``llm``, answering repeated calls from ``cache``. Only text responses are cached."""
+
+    def __init__(self, llm: BaseLLM, cache: TextCache, namespace: str, ttl: float = 0, bypass: bool = False):
+        self._llm = llm
+        self.cache = cache
+        self.namespace = namespace
+        self.ttl = ttl
+        self.bypass = bypass
+        super().__init__(
+            model=llm.model,
+            temperature=llm.temperature,
+            api_key=getattr(llm, "api_key", None),
+            base_url=getattr(llm, "base_url", None),
+            stop=list(llm.stop or []),
+        )
+
+    # Agents set their stop words on the LLM they are given; keep them on the wrapped LLM.
+    @property
+    def stop(self) -> List[str]:
+        return self._llm.stop
+
+    @stop.setter
+    def stop(self, value: List[str]) -> None:
+        self._llm.stop = value
+
+    def _key(self, messages: Any, tools: Any) -> str:
+        return llm_cache_key(self.model, self.namespace, messages, tools, self.stop)
+
+    def _lookup(self, key: str) -> Optional[str]:
+        if self.bypass:
+            return None
+        cached = self.cache.get(key, ttl=self.ttl)
+        telemetry.record("kyc_llm_cache_total", 1, result="hit" if cached is not None else "miss", task=self.namespace)
+        return cached
+
+    def _store(self, key: str, response: Any) -> None:
+        if isinstance(response, str) and response.strip():
+            self.cache.put(key, response)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        key = self._key(messages, tools)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        response = self._llm.call(
+            messages, tools=tools, callbacks=callbacks, available_functions=available_functions, **kwargs
+        )
+        self._store(key, response)
+        return response
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        key = self._key(messages, tools)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        response = await self._llm.acall(
+            messages, tools=tools, callbacks=callbacks, available_functions=available_functions, **kwargs
+        )
+        self._store(key, response)
+        return response
+
+    def supports_function_calling(self) -> bool:
+        return self._llm.supports_function_calling()
+
+    def supports_stop_words(self) -> bool:
+        return self._llm.supports_stop_words()
+
+    def get_context_window_size(self) -> int:
+        return self._llm.get_context_window_size()
+
+    def supports_multimodal(self) -> bool:
+        return self._llm.supports_multimodal()
+
+    def get_token_usage_summary(self):
+        return self._llm.get_token_usage_summary()
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for attributes the wrapper doesn't define itself.
+        if name == "_llm":
+            raise AttributeError(name)
+        return getattr(self._llm, name)
+
+
+def load_policies(path: str = POLICY_FILE) -> Dict[str, Dict[str, Any]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+_cache: Optional[TextCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> TextCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TextCache(
+                os.getenv("LLM_CACHE_PATH", "llm_cache.db"),
+                "llm_cache",
+                max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "128")) * 1024 * 1024),
+            )
+        return _cache
+
+
+def cached_llm(llm: BaseLLM, task_name: str) -> BaseLLM:
+    """``llm`` wrapped with the response cache if ``task_name``'s policy enables it, else ``llm`` itself."""
+    policy = load_policies().get(task_name) or {}
+    if not _flag("LLM_CACHE_ENABLED", "1") or not policy.get("enabled", False):
+        return llm
+    return CachedLLM(
+        llm,
+        get_llm_cache(),
+        namespace=task_name,
+        ttl=float(policy.get("ttl", 0)),
+        bypass=_flag("LLM_CACHE_BYPASS", "0"),
+    )
+
+
+if __name__ == "__main__":
+    print(get_llm_cache().stats())
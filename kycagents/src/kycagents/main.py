@@ -1,10 +1,13 @@
 #!/usr/bin/env python
+import os
 import sys
+import json
 import warnings
 
 from datetime import datetime
+from typing import Any, Dict, Optional
 
-from kycagents.crew import Kycagents
+from kycagents import telemetry
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
@@ -15,7 +18,7 @@ warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
 def run():
     """
-    Run the crew.
+    Run the crew, routing the file to the PDF or image OCR task by type.
     """
     # Use the first command-line argument as the file_path if provided
     file_path = sys.argv[1] if len(sys.argv) > 1 else 'test_ocr_document.jpg'
@@ -26,10 +29,28 @@ def run():
     }
 
     try:
-        Kycagents().crew().kickoff(inputs=inputs)
+        with telemetry.span("crew_startup", mode="subprocess"):
+            # crewai and litellm are first imported here, inside the startup
+            # span, so ``import kycagents.main`` itself stays cheap.
+            telemetry.install_llm_listeners()
+            from kycagents.crew import Kycagents, document_kind
+            document_crew = Kycagents().document_crew(document_kind(file_path))
+        result = telemetry.kickoff(document_crew, inputs)
     except Exception as e:
         raise Exception(f"An error occurred while running the crew: {e}")
 
+    # The backend reads the typed extraction and stage timings from this file
+    # instead of parsing stdout.
+    result_file = os.getenv("KYC_RESULT_FILE")
+    if result_file:
+        with open(result_file, "w", encoding="utf-8") as f:
+            json.dump({"extraction": extraction_dict(result), "telemetry": telemetry.drain()}, f)
+
+
+def extraction_dict(result) -> Optional[Dict[str, Any]]:
+    """A crew result's typed extraction as JSON-ready data (None if the agent produced none)."""
+    return result.pydantic.model_dump(mode="json") if getattr(result, "pydantic", None) else None
+
 
 def train():
     """
@@ -40,6 +61,7 @@ def train():
         'current_year': str(datetime.now().year)
     }
     try:
+        from kycagents.crew import Kycagents
         Kycagents().crew().train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs)
 
     except Exception as e:
@@ -50,6 +72,7 @@ def replay():
     Replay the crew execution from a specific task.
     """
     try:
+        from kycagents.crew import Kycagents
         Kycagents().crew().replay(task_id=sys.argv[1])
 
     except Exception as e:
@@ -65,6 +88,7 @@ def test():
     }
 
     try:
+        from kycagents.crew import Kycagents
         Kycagents().crew().test(n_iterations=int(sys.argv[1]), eval_llm=sys.argv[2], inputs=inputs)
 
     except Exception as e:
@@ -91,6 +115,7 @@ def run_with_trigger():
     }
 
     try:
+        from kycagents.crew import Kycagents
         result = Kycagents().crew().kickoff(inputs=inputs)
         return result
     except Exception as e:
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""
+Persistent crew worker pool.
+
+Running ``uv run run_crew <file>`` per case pays for environment resolution,
+interpreter start-up, the crewai/litellm imports and building ``Kycagents()``
+before any OCR happens. This module keeps a pool of long-lived worker
+processes that each build the crew once and then serve cases sent over a
+local socket (``multiprocessing.connection``).
+
+Configuration (environment):
+    CREW_POOL_ADDRESS   host:port to listen on (default 127.0.0.1:8765)
+    CREW_POOL_AUTHKEY   shared secret for the socket (required: the listener
+                        unpickles what authenticated clients send)
+    CREW_POOL_WORKERS   number of worker processes (default 2)
+    CREW_POOL_MAX_JOBS  recycle a worker after this many cases (default 50;
+                        needs Python 3.11+)
+
+A worker that dies mid-case (e.g. OOM-killed) breaks the executor. The case
+gets an error envelope back instead of hanging, and the executor is rebuilt
+for the next one.
+
+Start it with ``uv run crew_pool``.
+"""
+import io
+import os
+import sys
+import logging
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stdout
+from datetime import datetime
+from multiprocessing.connection import Listener
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_crews: Dict[str, Any] = {}
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def _init_worker() -> None:
+    """Build the per-document-kind crews once per worker process."""
+    from kycagents import telemetry
+    from kycagents.crew import Kycagents
+
+    telemetry.install_llm_listeners()
+    with telemetry.span("crew_startup", mode="pool"):
+        crew_base = Kycagents()
+        _crews["pdf"] = crew_base.document_crew("pdf")
+        _crews["image"] = crew_base.document_crew("image")
+    logger.info(f"Crew worker {os.getpid()} ready")
+
+
+def _run_case(file_path: str, case_id: Optional[str] = None, events_db: Optional[str] = None) -> Dict[str, Any]:
+    from kycagents import progress, telemetry
+    from kycagents.crew import document_kind
+
+    progress.set_case(case_id, events_db)
+
+    inputs = {
+        'file_path': file_path,
+        'current_year': str(datetime.now().year)
+    }
+    buffer = io.StringIO()
+    try:
+        with redirect_stdout(buffer):
+            # Crew.copy() gives fresh agent/task state per case without rebuilding the LLM config.
+            result = telemetry.kickoff(_crews[document_kind(file_path)].copy(), inputs)
+        extraction = result.pydantic.model_dump() if getattr(result, "pydantic", None) else None
+        return {"returncode": 0, "stdout": buffer.getvalue(), "extraction": extraction, "stderr": "",
+                "telemetry": telemetry.drain()}
+    except Exception:
+        return {"returncode": 1, "stdout": buffer.getvalue(), "extraction": None, "stderr": traceback.format_exc(),
+                "telemetry": telemetry.drain()}
+    finally:
+        progress.set_case(None)
+
+
+class CrewPool:
+    """Socket front-end dispatching cases to a recycling ``ProcessPoolExecutor``."""
+
+    def __init__(self, address: Tuple[str, int], authkey: bytes, workers: int, max_jobs: int):
+        self.address = address
+        self.authkey = authkey
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self.executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        options: Dict[str, Any] = {"max_workers": self.workers, "initializer": _init_worker}
+        if sys.version_info >= (3, 11):
+            options["max_tasks_per_child"] = self.max_jobs
+        else:
+            logger.warning("Worker recycling (CREW_POOL_MAX_JOBS) needs Python 3.11+; workers will not be recycled")
+        return ProcessPoolExecutor(**options)
+
+    def run_case(self, file_path: str, case_id: Optional[str] = None, events_db: Optional[str] = None) -> Dict[str, Any]:
+        executor = self.executor
+        try:
+            return executor.submit(_run_case, file_path, case_id, events_db).result()
+        except BrokenProcessPool as e:
+            logger.error(f"Crew worker died while processing {file_path}: {e}")
+            with self._lock:
+                if self.executor is executor:
+                    self.executor = self._new_executor()
+            executor.shutdown(wait=False, cancel_futures=True)
+            return {"returncode": 1, "stdout": "", "extraction": None,
+                    "stderr": f"Crew worker died while processing the case: {e}", "telemetry": []}
+
+    def _handle(self, conn) -> None:
+        try:
+            while True:
+                try:
+                    request = conn.recv()
+                except EOFError:
+                    return
+                file_path = request.get("file_path")
+                if not file_path:
+                    conn.send({"returncode": 2, "stdout": "", "extraction": None, "stderr": "file_path is required"})
+                    continue
+                conn.send(self.run_case(file_path, request.get("case_id"), request.get("events_db")))
+        except Exception as e:
+            logger.error(f"Crew pool connection failed: {e}")
+        finally:
+            conn.close()
+
+    def serve_forever(self) -> None:
+        with Listener(self.address, authkey=self.authkey) as listener:
+            logger.info(f"Crew pool listening on {self.address[0]}:{self.address[1]}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logger.error(f"Rejected crew pool connection: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+
+def serve():
+    """
+    Run the crew worker pool.
+    """
+    logging.basicConfig(level=logging.INFO)
+    authkey = os.getenv("CREW_POOL_AUTHKEY")
+    if not authkey:
+        # Anyone who can authenticate can make the pool unpickle arbitrary objects, i.e. run code.
+        raise SystemExit("CREW_POOL_AUTHKEY must be set to a secret shared with the backend")
+    address = parse_address(sys.argv[1] if len(sys.argv) > 1 else os.getenv("CREW_POOL_ADDRESS", "127.0.0.1:8765"))
+    pool = CrewPool(
+        address,
+        authkey=authkey.encode("utf-8"),
+        workers=int(os.getenv("CREW_POOL_WORKERS", "2")),
+        max_jobs=int(os.getenv("CREW_POOL_MAX_JOBS", "50")),
+    )
+    try:
+        pool.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,61 @@
+"""
+Progress reporting from the crew process to the backend.
+
+Events are appended to the backend's case event table (``KYC_EVENTS_DB``),
+which the API streams to clients as server-sent events. The case being
+processed comes from ``KYC_CASE_ID`` (set by the backend for ``run_crew``
+subprocesses) or ``set_case()`` (used by the worker pool, which handles one
+case per worker process at a time). Reporting is a no-op when either is
+unset, so the crew still runs standalone.
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Kept in sync with backend/app/events.py
+EVENTS_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS case_events ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " case_id TEXT NOT NULL,"
+    " type TEXT NOT NULL,"
+    " data TEXT NOT NULL,"
+    " created_at REAL NOT NULL"
+    ")"
+)
+
+_case_id: Optional[str] = None
+_events_db: Optional[str] = None
+_lock = threading.Lock()
+
+
+def set_case(case_id: Optional[str], events_db: Optional[str] = None) -> None:
+    global _case_id, _events_db
+    _case_id = case_id
+    _events_db = events_db
+
+
+def report(event_type: str, **data: Any) -> None:
+    """Publish one progress event for the current case. Never raises."""
+    case_id = _case_id or os.getenv("KYC_CASE_ID")
+    events_db = _events_db or os.getenv("KYC_EVENTS_DB")
+    if not case_id or not events_db:
+        return
+    try:
+        with _lock:
+            conn = sqlite3.connect(events_db, timeout=5, isolation_level=None)
+            try:
+                conn.execute(EVENTS_SCHEMA)
+                conn.execute(
+                    "INSERT INTO case_events (case_id, type, data, created_at) VALUES (?, ?, ?, ?)",
+                    (case_id, event_type, json.dumps(data), time.time()),
+                )
+            finally:
+                conn.close()
+    except Exception as e:
+        logger.warning(f"Could not report progress for {case_id}: {e}")
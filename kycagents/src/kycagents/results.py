@@ -0,0 +1,24 @@
+"""Typed crew outputs handed back to the backend instead of raw crew stdout."""
+from typing import Dict, Optional
+
+from pydantic import BaseModel, Field
+
+
+class ExtractedField(BaseModel):
+    value: Optional[str] = Field(None, description="The value exactly as read from the document, or null if absent.")
+    confidence: float = Field(0.0, ge=0.0, le=1.0, description="Confidence between 0 and 1 that the value is correct.")
+
+
+class ExtractedDocument(BaseModel):
+    """KYC identity fields extracted from one document, each with a confidence score."""
+    document_type: ExtractedField = Field(default_factory=ExtractedField, description="passport, id_card, driving_licence, utility_bill, bank_statement or other.")
+    full_name: ExtractedField = Field(default_factory=ExtractedField)
+    date_of_birth: ExtractedField = Field(default_factory=ExtractedField, description="ISO 8601 date (YYYY-MM-DD).")
+    nationality: ExtractedField = Field(default_factory=ExtractedField)
+    document_number: ExtractedField = Field(default_factory=ExtractedField)
+    issuing_country: ExtractedField = Field(default_factory=ExtractedField)
+    issue_date: ExtractedField = Field(default_factory=ExtractedField, description="ISO 8601 date (YYYY-MM-DD).")
+    expiry_date: ExtractedField = Field(default_factory=ExtractedField, description="ISO 8601 date (YYYY-MM-DD).")
+    address: ExtractedField = Field(default_factory=ExtractedField)
+    other_fields: Dict[str, ExtractedField] = Field(default_factory=dict, description="Any other KYC-relevant fields found.")
+    summary: str = Field("", description="One or two sentences describing the document.")
@@ -0,0 +1,98 @@
+"""
+Stage timings and usage counters recorded inside the crew process.
+
+Records are buffered in-process and handed back to the backend with each
+crew run (pool reply, or the ``KYC_RESULT_FILE`` envelope), where
+``app.metrics.ingest`` merges them into the ``/metrics`` endpoint. Names and
+labels match the backend's metric definitions.
+"""
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+_records: List[Dict[str, Any]] = []
+_lock = threading.Lock()
+_llm_started = threading.local()
+
+
+def record(name: str, value: float, **labels: Any) -> None:
+    with _lock:
+        _records.append({"name": name, "value": value, "labels": labels})
+
+
+@contextmanager
+def span(stage: str, **labels: Any):
+    """Time a block into ``kyc_stage_seconds{stage=...}``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record("kyc_stage_seconds", time.perf_counter() - started, stage=stage, **labels)
+
+
+def drain() -> List[Dict[str, Any]]:
+    """Return and clear the records buffered so far."""
+    with _lock:
+        records = list(_records)
+        _records.clear()
+    return records
+
+
+TOKEN_KINDS = ("prompt_tokens", "completion_tokens", "total_tokens")
+
+
+def _usage(metrics) -> Dict[str, int]:
+    return {kind: getattr(metrics, kind, 0) or 0 for kind in TOKEN_KINDS}
+
+
+def record_token_usage(result, before: Optional[Dict[str, int]] = None) -> None:
+    """
+    Record the tokens used by one kickoff. LLM usage counters accumulate over
+    the life of the LLM object, which is shared across runs in a pool worker,
+    so the usage from before the run is subtracted.
+    """
+    usage = getattr(result, "token_usage", None)
+    if usage is None:
+        return
+    for kind, value in _usage(usage).items():
+        value -= (before or {}).get(kind, 0)
+        if value > 0:
+            record("kyc_llm_tokens_total", value, kind=kind.replace("_tokens", ""), source="agent")
+
+
+def kickoff(crew, inputs: Dict[str, Any]):
+    """Kick off a crew, recording its duration and token usage."""
+    before = _usage(crew.calculate_usage_metrics()) if hasattr(crew, "calculate_usage_metrics") else None
+    with span("crew_kickoff"):
+        result = crew.kickoff(inputs=inputs)
+    record_token_usage(result, before)
+    return result
+
+
+def install_llm_listeners() -> None:
+    """
+    Time each LLM call (``stage="llm_call"``) via crewai's event bus. Agents
+    call the LLM sequentially on their own thread, so a thread-local start
+    time pairs each completion with its start. Silently skipped on crewai
+    versions without these events.
+    """
+    try:
+        from crewai.events import crewai_event_bus, LLMCallStartedEvent, LLMCallCompletedEvent, LLMCallFailedEvent
+    except ImportError:
+        return
+
+    @crewai_event_bus.on(LLMCallStartedEvent)
+    def _on_started(source, event):
+        _llm_started.value = time.perf_counter()
+
+    def _on_finished(outcome):
+        def handler(source, event):
+            started = getattr(_llm_started, "value", None)
+            if started is not None:
+                record("kyc_stage_seconds", time.perf_counter() - started, stage="llm_call", outcome=outcome)
+                _llm_started.value = None
+        return handler
+
+    crewai_event_bus.on(LLMCallCompletedEvent)(_on_finished("completed"))
+    crewai_event_bus.on(LLMCallFailedEvent)(_on_finished("failed"))
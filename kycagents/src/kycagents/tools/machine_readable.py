@@ -0,0 +1,298 @@
+"""
+CPU-only fast path for machine-readable identity documents.
+
+Before a page goes to the vision model, ``extract_machine_readable`` looks
+for:
+
+- an ICAO 9303 machine-readable zone: TD3 passports, TD1 ID cards and TD2
+  documents. The MRZ band is read with Tesseract and validated with its
+  check digits.
+- a PDF417 barcode with AAMVA ID fields (US/Canadian licences and ID cards),
+  decoded with zxing-cpp.
+
+A result carries structured fields plus a confidence: the share of MRZ check
+digits that validate, or a fixed high value for a decoded AAMVA barcode. The
+OCR tool only skips the vision call when the confidence meets
+``OCR_FAST_PATH_MIN_CONFIDENCE``. It is only tried on identity document
+types (``ID_DOCUMENT_TYPES``) and on single images of unknown type, never on
+the pages of other PDFs. Both decoders are optional dependencies
+(``pip install kycagents[fastpath]`` plus the ``tesseract`` binary); without
+them the fast path simply finds nothing.
+"""
+import re
+import logging
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pytesseract
+except ImportError:  # pragma: no cover - optional dependency
+    pytesseract = None
+
+try:
+    import zxingcpp
+except ImportError:  # pragma: no cover - optional dependency
+    zxingcpp = None
+
+MRZ_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789<"
+# Line length -> (document format, number of lines)
+MRZ_FORMATS = {44: ("TD3", 2), 36: ("TD2", 2), 30: ("TD1", 3)}
+# Letters OCR commonly reads in place of digits in numeric MRZ fields, and vice versa
+DIGIT_FIXES = str.maketrans({"O": "0", "Q": "0", "D": "0", "I": "1", "L": "1", "Z": "2", "S": "5", "G": "6", "B": "8"})
+LETTER_FIXES = str.maketrans({"0": "O", "1": "I", "2": "Z", "5": "S", "6": "G", "8": "B"})
+AAMVA_CONFIDENCE = 0.95
+# Document types that carry an MRZ or ID barcode. Other types (bank
+# statements, utility bills) never reach the decoders.
+ID_DOCUMENT_TYPES = frozenset({"passport", "id_card", "driving_licence", "drivers_license", "residence_permit", "visa"})
+
+
+class MachineReadable:
+    def __init__(self, source: str, fields: Dict[str, Optional[str]], confidence: float, raw: str):
+        self.source = source
+        self.fields = fields
+        self.confidence = confidence
+        self.raw = raw
+
+    def as_text(self) -> str:
+        """Page text handed to the agent in place of the vision model's transcription."""
+        lines = [f"[Decoded locally from the {self.source}, confidence {self.confidence:.2f}]"]
+        lines += [f"{name.replace('_', ' ').capitalize()}: {value}" for name, value in self.fields.items() if value]
+        lines += ["", self.raw]
+        return "\n".join(lines)
+
+
+def check_digit(field: str) -> str:
+    """ICAO 9303 check digit (weights 7, 3, 1; A-Z = 10-35; filler = 0)."""
+    total = 0
+    for i, char in enumerate(field):
+        if char.isdigit():
+            value = int(char)
+        elif "A" <= char <= "Z":
+            value = ord(char) - 55
+        else:
+            value = 0
+        total += value * (7, 3, 1)[i % 3]
+    return str(total % 10)
+
+
+def _digits(field: str) -> str:
+    return field.translate(DIGIT_FIXES)
+
+
+def _letters(field: str) -> str:
+    return field.translate(LETTER_FIXES).replace("<", "")
+
+
+def _mrz_date(yymmdd: str, future: bool) -> Optional[str]:
+    """ISO date from YYMMDD; expiry dates are assumed to be this century, birth dates not in the future."""
+    try:
+        yy, mm, dd = int(yymmdd[:2]), int(yymmdd[2:4]), int(yymmdd[4:6])
+        today = date.today()
+        century = 2000 if future or 2000 + yy <= today.year else 1900
+        return date(century + yy, mm, dd).isoformat()
+    except ValueError:
+        return None
+
+
+def _name(field: str) -> Tuple[str, str]:
+    surname, _, given = field.partition("<<")
+    return surname.replace("<", " ").strip(), given.replace("<", " ").strip()
+
+
+def _clean(field: str) -> str:
+    return field.replace("<", " ").strip()
+
+
+def parse_mrz(lines: List[str]) -> Optional[MachineReadable]:
+    """Parse and validate TD1/TD2/TD3 MRZ lines. Returns None if they don't form an MRZ."""
+    if not lines or len(lines[0]) not in MRZ_FORMATS:
+        return None
+    kind, count = MRZ_FORMATS[len(lines[0])]
+    if len(lines) != count or any(len(line) != len(lines[0]) for line in lines):
+        return None
+
+    if kind == "TD1":
+        l1, l2, l3 = lines
+        number, number_cd = l1[5:14], _digits(l1[14])
+        birth, birth_cd = _digits(l2[0:6]), _digits(l2[6])
+        sex = l2[7]
+        expiry, expiry_cd = _digits(l2[8:14]), _digits(l2[14])
+        nationality = l2[15:18]
+        surname, given = _name(l3)
+        composite = l1[5:30] + birth + birth_cd + expiry + expiry_cd + l2[18:29]
+        composite_cd = _digits(l2[29])
+        optional = _clean(l1[15:30])
+    else:
+        l1, l2 = lines
+        width = len(l1)
+        surname, given = _name(l1[5:])
+        number, number_cd = l2[0:9], _digits(l2[9])
+        nationality = l2[10:13]
+        birth, birth_cd = _digits(l2[13:19]), _digits(l2[19])
+        sex = l2[20]
+        expiry, expiry_cd = _digits(l2[21:27]), _digits(l2[27])
+        if kind == "TD3":
+            optional, optional_cd = l2[28:42], _digits(l2[42])
+            composite = number + number_cd + birth + birth_cd + expiry + expiry_cd + optional + optional_cd
+        else:
+            optional, optional_cd = l2[28:35], None
+            composite = number + number_cd + birth + birth_cd + expiry + expiry_cd + optional
+        composite_cd = _digits(l2[width - 1])
+
+    checks = [
+        check_digit(number) == number_cd,
+        check_digit(birth) == birth_cd,
+        check_digit(expiry) == expiry_cd,
+        check_digit(composite) == composite_cd,
+    ]
+    if kind == "TD3" and optional.strip("<"):
+        checks.append(check_digit(optional) == optional_cd)
+    optional = _clean(optional)
+
+    document_code = lines[0][0:2].replace("<", "")
+    fields = {
+        "document_type": {"P": "passport", "I": "id_card", "A": "id_card", "C": "id_card", "V": "visa"}.get(
+            document_code[:1], "travel_document"
+        ),
+        "document_code": document_code,
+        "issuing_country": _letters(lines[0][2:5]),
+        "surname": surname,
+        "given_names": given,
+        "full_name": " ".join(part for part in (given, surname) if part),
+        "document_number": _clean(number),
+        "nationality": _letters(nationality),
+        "date_of_birth": _mrz_date(birth, future=False),
+        "sex": {"M": "M", "F": "F"}.get(sex, "unspecified"),
+        "expiry_date": _mrz_date(expiry, future=True),
+        "personal_number": optional or None,
+    }
+    confidence = sum(checks) / len(checks)
+    return MachineReadable(f"{kind} machine-readable zone", fields, confidence, "\n".join(lines))
+
+
+def find_mrz(text: str) -> Optional[MachineReadable]:
+    """Pick the best-validating MRZ out of OCR'd text."""
+    candidates = []
+    for raw in text.splitlines():
+        line = re.sub(r"\s+", "", raw.upper()).replace("«", "<")
+        line = "".join(c for c in line if c in MRZ_CHARS)
+        if len(line) >= 28 and "<" in line:
+            candidates.append(line)
+
+    best = None
+    for width, (_, count) in MRZ_FORMATS.items():
+        # OCR sometimes drops or adds a trailing filler; pad/trim lines close to the expected width.
+        lines = [line.ljust(width, "<")[:width] for line in candidates if abs(len(line) - width) <= 2]
+        for start in range(0, max(0, len(lines) - count + 1)):
+            result = parse_mrz(lines[start:start + count])
+            if result and (best is None or result.confidence > best.confidence):
+                best = result
+    return best
+
+
+def _mrz_band(img: Image.Image) -> Image.Image:
+    """Binarized bottom third of the page, where TD1/TD2/TD3 zones sit, upscaled for Tesseract."""
+    gray = ImageOps.grayscale(img)
+    width, height = gray.size
+    band = gray.crop((0, int(height * 0.65), width, height))
+    if band.width < 1500:
+        scale = 1500 / band.width
+        band = band.resize((1500, int(band.height * scale)))
+    return ImageOps.autocontrast(band).point(lambda p: 255 if p > 128 else 0)
+
+
+def read_mrz(img: Image.Image) -> Optional[MachineReadable]:
+    if pytesseract is None:
+        return None
+    config = f"--psm 6 -c tessedit_char_whitelist={MRZ_CHARS}"
+    try:
+        # One Tesseract pass over the MRZ band only. A zone the band misses
+        # (e.g. a rotated scan) goes to the vision model rather than paying
+        # for a second, whole-page pass.
+        return find_mrz(pytesseract.image_to_string(_mrz_band(img), config=config))
+    except Exception as e:  # Tesseract missing or failing must never break OCR
+        logger.warning(f"MRZ read failed: {e}")
+        return None
+
+
+AAMVA_FIELDS = {
+    "DCS": "surname",
+    "DAC": "given_names",
+    "DAD": "middle_names",
+    "DAQ": "document_number",
+    "DBB": "date_of_birth",
+    "DBA": "expiry_date",
+    "DBD": "issue_date",
+    "DCG": "issuing_country",
+    "DAG": "address",
+    "DAI": "city",
+    "DAJ": "state",
+    "DAK": "postal_code",
+}
+
+
+def _aamva_date(value: str, country: Optional[str]) -> Optional[str]:
+    """AAMVA dates are MMDDCCYY in the US and CCYYMMDD in Canada."""
+    try:
+        if country == "CAN":
+            return date(int(value[:4]), int(value[4:6]), int(value[6:8])).isoformat()
+        return date(int(value[4:8]), int(value[:2]), int(value[2:4])).isoformat()
+    except (ValueError, IndexError):
+        return None
+
+
+def parse_aamva(text: str) -> Optional[MachineReadable]:
+    """Parse the ID fields of an AAMVA PDF417 payload."""
+    if "ANSI " not in text[:40] and "AAMVA" not in text[:40]:
+        return None
+    values: Dict[str, str] = {}
+    for line in re.split(r"[\r\n\x1e]+", text):
+        line = line.strip()
+        # The first element of a subfile directly follows its "DL"/"ID" designator,
+        # which may sit at the end of the header line.
+        match = re.match(r"(D[A-Z]{2})(.*)$", line) or re.search(r"(?:DL|ID)(D[A-Z]{2})(.*)$", line)
+        if match and match.group(1) in AAMVA_FIELDS:
+            values.setdefault(match.group(1), match.group(2).strip())
+    if "DCS" not in values or "DAQ" not in values:
+        return None
+
+    country = values.get("DCG")
+    fields: Dict[str, Optional[str]] = {AAMVA_FIELDS[code]: value for code, value in values.items()}
+    for code in ("DBB", "DBA", "DBD"):
+        if code in values:
+            fields[AAMVA_FIELDS[code]] = _aamva_date(values[code], country)
+    fields["document_type"] = "driving_licence" if "DL" in text[:60] else "id_card"
+    fields["full_name"] = " ".join(
+        v for v in (fields.get("given_names"), fields.get("middle_names"), fields.get("surname")) if v
+    )
+    return MachineReadable("PDF417 barcode (AAMVA)", fields, AAMVA_CONFIDENCE, text)
+
+
+def read_barcode(img: Image.Image) -> Optional[MachineReadable]:
+    if zxingcpp is None:
+        return None
+    try:
+        for barcode in zxingcpp.read_barcodes(img, formats=zxingcpp.BarcodeFormat.PDF417):
+            # Raw bytes: .text may render control characters as placeholders
+            result = parse_aamva(bytes(barcode.bytes).decode("latin-1"))
+            if result:
+                return result
+    except Exception as e:
+        logger.warning(f"Barcode read failed: {e}")
+    return None
+
+
+def applies_to(document_type: Optional[str], ext: str) -> bool:
+    """Whether a document may carry an MRZ or ID barcode worth decoding locally."""
+    if document_type:
+        return document_type.lower() in ID_DOCUMENT_TYPES
+    return ext != ".pdf"
+
+
+def extract_machine_readable(img: Image.Image) -> Optional[MachineReadable]:
+    """Best local decode of a page: a PDF417 ID barcode, else an MRZ."""
+    return read_barcode(img) or read_mrz(img)
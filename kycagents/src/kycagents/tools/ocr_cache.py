@@ -0,0 +1,59 @@
+"""
+Content-addressed cache for vision-model OCR results.
+
+Entries are keyed by a SHA-256 of the model name, the prompt and the exact
+page image bytes sent to the model, so a re-uploaded passport or a re-run
+analysis never pays for the same vision call twice. Results live in a local
+SQLite file capped at ``OCR_CACHE_MAX_MB``; least recently used entries are
+evicted first and entries older than ``OCR_CACHE_TTL`` seconds (0 = never)
+are treated as misses. Hit/miss/eviction counters are persisted alongside the
+entries so they can be read from any process with ``python -m
+kycagents.tools.ocr_cache``.
+"""
+import os
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+from kycagents.cache import TextCache
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(model: str, prompt: str, image_bytes: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in (model.encode("utf-8"), prompt.encode("utf-8")):
+        digest.update(len(part).to_bytes(4, "big"))
+        digest.update(part)
+    digest.update(image_bytes)
+    return digest.hexdigest()
+
+
+class OcrCache(TextCache):
+    def __init__(self, path: str, max_bytes: int, ttl: float = 0):
+        super().__init__(path, "ocr_cache", max_bytes, ttl)
+
+
+_cache: Optional[OcrCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> Optional[OcrCache]:
+    """Process-wide OCR cache, or None when disabled with OCR_CACHE_ENABLED=0."""
+    global _cache
+    if os.getenv("OCR_CACHE_ENABLED", "1") in ("0", "false", "False"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = OcrCache(
+                os.getenv("OCR_CACHE_PATH", "ocr_cache.db"),
+                max_bytes=int(float(os.getenv("OCR_CACHE_MAX_MB", "256")) * 1024 * 1024),
+                ttl=float(os.getenv("OCR_CACHE_TTL", "0")),
+            )
+        return _cache
+
+
+if __name__ == "__main__":
+    cache = get_ocr_cache()
+    print(cache.stats() if cache else "OCR cache disabled")
@@ -1,77 +1,248 @@
 import os
+import json
 import base64
-import requests
-from typing import Type, Optional
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, Iterator, List, Type, Optional
 from crewai.tools import BaseTool
 from pydantic import BaseModel, Field
 from PIL import Image
-from io import BytesIO
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+from kycagents import progress, telemetry
+from kycagents.http_client import get_http_client
+from kycagents.tools.machine_readable import applies_to, extract_machine_readable
+from kycagents.tools.ocr_cache import cache_key, get_ocr_cache
+from kycagents.tools.preprocess import PreprocessOptions, preprocess_page
+from kycagents.tools.relevance import fields_found, required_fields, select_relevant
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".bmp", ".webp"]
+OCR_PROMPT = "Extract all text and information from this image. Output in a structured format if applicable."
+
+# PDF rasterization settings per document type: render DPI and the maximum
+# pixel length of a page's longer side. Override or extend with a JSON object
+# in OCR_RASTER_PROFILES, e.g. {"bank_statement": {"dpi": 120}}.
+DEFAULT_RASTER_PROFILES: Dict[str, Dict[str, Any]] = {
+    "default": {"dpi": 200, "max_side": 2400},
+    "passport": {"dpi": 300, "max_side": 3000},
+    "id_card": {"dpi": 300, "max_side": 3000},
+    "utility_bill": {"dpi": 150, "max_side": 2000},
+    "bank_statement": {"dpi": 150, "max_side": 2000},
+}
+
+
+def raster_profile(document_type: Optional[str]) -> Dict[str, Any]:
+    profiles = {name: dict(profile) for name, profile in DEFAULT_RASTER_PROFILES.items()}
+    for name, overrides in json.loads(os.getenv("OCR_RASTER_PROFILES", "{}")).items():
+        profiles.setdefault(name, dict(profiles["default"])).update(overrides)
+    return profiles.get((document_type or "default").lower(), profiles["default"])
+
+
+def _page_size_points(info: Dict[str, Any]) -> Optional[float]:
+    """Longer side in points of the first page, from pdfinfo's "Page size" ("612 x 792 pts (letter)")."""
+    try:
+        width, _, height = info["Page size"].split()[:3]
+        return max(float(width), float(height))
+    except (KeyError, ValueError):
+        return None
+
 
 class DocumentOcrToolInput(BaseModel):
     """Input schema for DocumentOcrTool."""
     file_path: str = Field(..., description="The absolute path to the PDF or image file to extract information from.")
+    document_type: Optional[str] = Field(
+        None,
+        description="Optional document type (passport, id_card, utility_bill, bank_statement) used to pick rasterization quality.",
+    )
 
 class DocumentOcrTool(BaseTool):
     name: str = "document_ocr_tool"
     description: str = "Extracts text and structured information from PDFs and images using the GLM-OCR model. Useful for processing KYC documents like IDs, proofs of address, etc."
     args_schema: Type[BaseModel] = DocumentOcrToolInput
+    # Pages encoded and sent to the vision model concurrently
+    max_in_flight: int = Field(default_factory=lambda: int(os.getenv("OCR_MAX_IN_FLIGHT", "4")))
+    # Seconds allowed for each attempt of a page's vision call (connect, read)
+    connect_timeout: float = Field(default_factory=lambda: float(os.getenv("OCR_CONNECT_TIMEOUT", "10")))
+    page_timeout: float = Field(default_factory=lambda: float(os.getenv("OCR_PAGE_TIMEOUT", "120")))
+    # PDF pages rasterized per pdf2image call; bounds rasterization memory
+    raster_window: int = Field(default_factory=lambda: int(os.getenv("OCR_RASTER_WINDOW", "2")))
+    preprocess: PreprocessOptions = Field(default_factory=PreprocessOptions)
+    # Decode MRZs and PDF417 ID barcodes locally (ID document types and single
+    # images only); pages decoded with at least this confidence skip the vision model.
+    fast_path: bool = Field(default_factory=lambda: os.getenv("OCR_FAST_PATH", "1").lower() not in ("0", "false", "no"))
+    fast_path_min_confidence: float = Field(
+        default_factory=lambda: float(os.getenv("OCR_FAST_PATH_MIN_CONFIDENCE", "0.9"))
+    )
+    # Stop reading a document once its pages show every required KYC field
+    early_stop: bool = Field(default_factory=lambda: os.getenv("OCR_EARLY_STOP", "1").lower() not in ("0", "false", "no"))
+    # Characters of page text handed to the agent; longer documents are cut to
+    # their most KYC-relevant chunks (0 = always the full text)
+    context_chars: int = Field(default_factory=lambda: int(os.getenv("OCR_CONTEXT_CHARS", "8000")))
+
+    def _rasterize_pdf(self, file_path: str, document_type: Optional[str]) -> Iterator[Image.Image]:
+        """
+        Yield PDF pages a small window at a time instead of rasterizing the
+        whole document up front, so peak memory does not grow with page count.
+        """
+        profile = raster_profile(document_type)
+        info = pdfinfo_from_path(file_path)
+        page_count = int(info["Pages"])
+        progress.report("ocr_pages", file=os.path.basename(file_path), pages=page_count)
+        max_side = profile["max_side"]
+
+        # Lower the DPI so the rendered page stays within max_side pixels.
+        dpi = profile["dpi"]
+        side_points = _page_size_points(info)
+        if side_points:
+            dpi = max(36, min(dpi, int(max_side * 72 / side_points)))
+
+        for first in range(1, page_count + 1, self.raster_window):
+            last = min(first + self.raster_window - 1, page_count)
+            with telemetry.span("rasterize"):
+                pages = convert_from_path(file_path, dpi=dpi, first_page=first, last_page=last)
+            for page in pages:
+                # Later pages may be larger than the first; enforce the cap per page.
+                if max(page.size) > max_side:
+                    page.thumbnail((max_side, max_side))
+                yield page
+
+    def _load_pages(self, file_path: str, ext: str, document_type: Optional[str] = None) -> Iterator[Image.Image]:
+        if ext == ".pdf":
+            yield from self._rasterize_pdf(file_path, document_type)
+        else:
+            yield Image.open(file_path)
+
+    def _ocr_page(self, img: Image.Image, index: int, headers: dict, file_name: str = "", fast_path: bool = False) -> str:
+        if fast_path:
+            with telemetry.span("machine_readable"):
+                decoded = extract_machine_readable(img)
+            if decoded and decoded.confidence >= self.fast_path_min_confidence:
+                progress.report("ocr_page", file=file_name, page=index + 1, status="machine_readable")
+                return f"--- Page {index+1} ---\n{decoded.as_text()}"
+            if decoded:
+                logger.info(
+                    f"Page {index+1}: {decoded.source} confidence {decoded.confidence:.2f} too low, using the vision model"
+                )
+
+        # Crop, deskew, downscale and re-encode the page to shrink the payload.
+        with telemetry.span("preprocess"):
+            image_bytes, stats = preprocess_page(img, self.preprocess)
+        logger.info(
+            f"Page {index+1}: sending {stats['sent_bytes']} bytes "
+            f"({stats['bytes_saved']} saved of {stats['original_bytes']})"
+        )
 
-    def _run(self, file_path: str) -> str:
+        model = os.getenv("VISION_MODEL", "qwen3-vl:235b")
+        cache = get_ocr_cache()
+        key = cache_key(model, OCR_PROMPT, image_bytes) if cache else None
+        if cache:
+            cached = cache.get(key)
+            if cached is not None:
+                progress.report("ocr_page", file=file_name, page=index + 1, status="cached")
+                return f"--- Page {index+1} ---\n{cached}"
+
+        payload = {
+            "model": model,
+            "prompt": OCR_PROMPT,
+            "images": [base64.b64encode(image_bytes).decode("utf-8")],
+            "stream": False
+        }
+
+        telemetry.record("kyc_model_bytes_sent", len(image_bytes))
+        status = "error"
+        try:
+            with telemetry.span("vision_call"):
+                # Pooled, retried and failed over across OLLAMA_BASE_URL / OLLAMA_FALLBACK_URLS
+                response = get_http_client().post(
+                    "/api/generate", headers=headers, json=payload, timeout=(self.connect_timeout, self.page_timeout)
+                )
+            if response.status_code == 200:
+                resp_json = response.json()
+                text = resp_json.get("response", "")
+                # Ollama reports token counts for the generation
+                for field, kind in (("prompt_eval_count", "prompt"), ("eval_count", "completion")):
+                    if resp_json.get(field):
+                        telemetry.record("kyc_llm_tokens_total", resp_json[field], kind=kind, source="vision")
+                if cache:
+                    cache.put(key, text)
+                status = "done"
+            else:
+                text = f"Error from API: {response.status_code} - {response.text}"
+        except Exception as e:
+            text = f"Exception during API call: {str(e)}"
+        progress.report("ocr_page", file=file_name, page=index + 1, status=status)
+        return f"--- Page {index+1} ---\n{text}"
+
+    def iter_pages(
+        self, file_path: str, document_type: Optional[str] = None, headers: Optional[dict] = None
+    ) -> Iterator[str]:
+        """
+        Yield each page's text, in page order, as soon as it is ready. Pages
+        are handed to the pool as they are loaded, so loading, JPEG encoding
+        and the vision calls overlap; at most ``max_in_flight`` pages are
+        pending at a time. Closing the generator early stops loading and
+        cancels the pages not yet started.
+        """
+        ext = os.path.splitext(file_path)[1].lower()
+        headers = headers if headers is not None else self._headers()
+        file_name = os.path.basename(file_path)
+        fast_path = self.fast_path and applies_to(document_type, ext)
+        pending: Deque[Future] = deque()
+        executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="ocr-page")
+        try:
+            for i, img in enumerate(self._load_pages(file_path, ext, document_type)):
+                while pending and (pending[0].done() or len(pending) >= self.max_in_flight):
+                    yield pending.popleft().result()
+                pending.append(executor.submit(self._ocr_page, img, i, headers, file_name, fast_path))
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Pages already at the model finish in the background (and land in the OCR cache).
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _headers(self) -> dict:
+        # Note: Using the base /api/generate for vision models in Ollama often works better with raw images
+        return {
+            "Authorization": f"Bearer {os.getenv('OLLAMA_API_KEY')}",
+            "Content-Type": "application/json"
+        }
+
+    def _run(self, file_path: str, document_type: Optional[str] = None) -> str:
         if not os.path.exists(file_path):
             return f"Error: File not found at {file_path}"
 
         ext = os.path.splitext(file_path)[1].lower()
-        images = []
+        if ext != ".pdf" and ext not in IMAGE_EXTENSIONS:
+            return f"Error: Unsupported file extension {ext}"
 
+        file_name = os.path.basename(file_path)
+        progress.report("ocr_started", file=file_name)
+
+        required = required_fields(document_type) if self.early_stop else frozenset()
+        found: set = set()
+        texts: List[str] = []
+        pages = self.iter_pages(file_path, document_type)
         try:
-            if ext == ".pdf":
-                # Convert PDF to list of images
-                pages = convert_from_path(file_path)
-                images.extend(pages)
-            elif ext in [".jpg", ".jpeg", ".png", ".bmp", ".webp"]:
-                images.append(Image.open(file_path))
-            else:
-                return f"Error: Unsupported file extension {ext}"
+            for text in pages:
+                texts.append(text)
+                found |= fields_found(text)
+                if required and required <= found:
+                    break
         except Exception as e:
+            progress.report("ocr_finished", file=file_name, status="error", error=str(e))
             return f"Error processing file: {str(e)}"
+        finally:
+            pages.close()
 
-        results = []
-        api_key = os.getenv("OLLAMA_API_KEY")
-        # Note: Using the base /api/generate for vision models in Ollama often works better with raw images
-        base_url = os.getenv("OLLAMA_BASE_URL", "https://ollama.com").replace("/v1", "")
-        url = f"{base_url}/api/generate"
-
-        for i, img in enumerate(images):
-            # Ensure image is in RGB for JPEG conversion
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            buffered = BytesIO()
-            img.save(buffered, format="JPEG")
-            img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-
-            payload = {
-                "model": os.getenv("VISION_MODEL", "qwen3-vl:235b"),
-                "prompt": "Extract all text and information from this image. Output in a structured format if applicable.",
-                "images": [img_str],
-                "stream": False
-            }
-            
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
-
-            try:
-                response = requests.post(url, headers=headers, json=payload)
-                if response.status_code == 200:
-                    resp_json = response.json()
-                    text = resp_json.get("response", "")
-                    results.append(f"--- Page {i+1} ---\n{text}")
-                else:
-                    results.append(f"--- Page {i+1} ---\nError from API: {response.status_code} - {response.text}")
-            except Exception as e:
-                results.append(f"--- Page {i+1} ---\nException during API call: {str(e)}")
-
-        return "\n\n".join(results)
+        stopped_early = bool(required) and required <= found
+        progress.report("ocr_finished", file=file_name, status="done", pages=len(texts), stopped_early=stopped_early)
+        output, omitted = select_relevant(texts, self.context_chars)
+        notes = []
+        if stopped_early and ext == ".pdf":
+            notes.append(f"Stopped after page {len(texts)}: {', '.join(sorted(required))} found.")
+        if omitted:
+            notes.append(f"{omitted} chunks without KYC-relevant content were left out.")
+        return output + (f"\n\n[{' '.join(notes)}]" if notes else "")
@@ -0,0 +1,145 @@
+"""
+Page preprocessing before the vision call.
+
+Pages are sent to the vision model as base64 JPEG inside a JSON body, so every
+byte saved here is saved on the upload and in model latency. The stages
+(each configurable through ``OCR_*`` environment variables) are:
+
+1. auto-crop to the document region (drop uniform scanner/table background)
+2. deskew small rotations using a projection-profile search
+3. grayscale when the page carries no meaningful colour
+4. downscale to a maximum side length (before deskew/grayscale, so those run on fewer pixels)
+5. pick the highest JPEG quality that fits the per-page byte target
+
+Only Pillow is used so the stage runs anywhere the tool does.
+"""
+import os
+from io import BytesIO
+from typing import Any, Dict, Tuple
+
+from PIL import Image, ImageChops, ImageOps, ImageStat
+from pydantic import BaseModel, Field
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() not in ("0", "false", "no")
+
+
+class PreprocessOptions(BaseModel):
+    enabled: bool = Field(default_factory=lambda: _env_bool("OCR_PREPROCESS", "1"))
+    max_side: int = Field(default_factory=lambda: int(os.getenv("OCR_MAX_SIDE", "1600")))
+    auto_crop: bool = Field(default_factory=lambda: _env_bool("OCR_AUTO_CROP", "1"))
+    deskew: bool = Field(default_factory=lambda: _env_bool("OCR_DESKEW", "1"))
+    max_skew_degrees: float = Field(default_factory=lambda: float(os.getenv("OCR_MAX_SKEW", "5")))
+    # auto | always | never
+    grayscale: str = Field(default_factory=lambda: os.getenv("OCR_GRAYSCALE", "auto"))
+    # Mean HSV saturation (0-255) below which "auto" treats a page as colourless
+    grayscale_saturation: float = Field(default_factory=lambda: float(os.getenv("OCR_GRAYSCALE_SATURATION", "18")))
+    max_quality: int = Field(default_factory=lambda: int(os.getenv("OCR_JPEG_QUALITY", "85")))
+    min_quality: int = Field(default_factory=lambda: int(os.getenv("OCR_JPEG_MIN_QUALITY", "55")))
+    target_bytes: int = Field(default_factory=lambda: int(float(os.getenv("OCR_TARGET_KB", "350")) * 1024))
+
+
+def auto_crop(img: Image.Image, threshold: int = 40, margin: float = 0.02) -> Image.Image:
+    """Crop to the region that differs from the border colour, keeping a small margin."""
+    gray = img.convert("L")
+    w, h = gray.size
+    border = [gray.getpixel(p) for p in ((0, 0), (w - 1, 0), (0, h - 1), (w - 1, h - 1))]
+    background = sorted(border)[len(border) // 2]
+    diff = ImageChops.difference(gray, Image.new("L", gray.size, background))
+    bbox = diff.point(lambda p: 255 if p > threshold else 0).getbbox()
+    if not bbox:
+        return img
+    left, top, right, bottom = bbox
+    # Ignore crops that would keep almost everything or leave a sliver.
+    area = (right - left) * (bottom - top)
+    if area > 0.95 * w * h or area < 0.2 * w * h:
+        return img
+    pad_x, pad_y = int(w * margin), int(h * margin)
+    return img.crop((max(0, left - pad_x), max(0, top - pad_y), min(w, right + pad_x), min(h, bottom + pad_y)))
+
+
+def _row_profile_score(binary: Image.Image, angle: float) -> float:
+    rotated = binary.rotate(angle, resample=Image.NEAREST, expand=False, fillcolor=0)
+    # Width-1 box resize gives the mean ink per row; text lines aligned with
+    # the x axis give the sharpest (highest variance) profile.
+    rows = list(rotated.resize((1, rotated.height), Image.BOX).getdata())
+    mean = sum(rows) / len(rows)
+    return sum((r - mean) ** 2 for r in rows)
+
+
+def estimate_skew(img: Image.Image, max_degrees: float, step: float = 0.5) -> float:
+    small = img.convert("L")
+    small.thumbnail((400, 400))
+    # Ink as white on black so rotation fill does not add ink.
+    binary = ImageOps.invert(ImageOps.autocontrast(small)).point(lambda p: 255 if p > 128 else 0)
+    best_angle, best_score = 0.0, _row_profile_score(binary, 0.0)
+    angle = -max_degrees
+    while angle <= max_degrees:
+        if angle != 0:
+            score = _row_profile_score(binary, angle)
+            if score > best_score:
+                best_angle, best_score = angle, score
+        angle += step
+    return best_angle
+
+
+def is_colourless(img: Image.Image, saturation: float) -> bool:
+    sample = img.convert("RGB")
+    sample.thumbnail((256, 256))
+    return ImageStat.Stat(sample.convert("HSV").split()[1]).mean[0] < saturation
+
+
+def encode_jpeg(img: Image.Image, options: PreprocessOptions) -> Tuple[bytes, int]:
+    """Encode at the highest quality (stepping down by 10) that fits ``target_bytes``."""
+    quality = options.max_quality
+    while True:
+        buffered = BytesIO()
+        img.save(buffered, format="JPEG", quality=quality, optimize=True)
+        data = buffered.getvalue()
+        if len(data) <= options.target_bytes or quality - 10 < options.min_quality:
+            return data, quality
+        quality -= 10
+
+
+def preprocess_page(img: Image.Image, options: PreprocessOptions) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Prepare a page for the vision model. Returns the JPEG bytes to send and
+    a stats dict including ``bytes_saved`` versus a plain full-size encode.
+    """
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    baseline = BytesIO()
+    img.save(baseline, format="JPEG")
+    stats: Dict[str, Any] = {"original_size": img.size, "original_bytes": baseline.tell()}
+
+    if not options.enabled:
+        stats.update(sent_bytes=stats["original_bytes"], bytes_saved=0)
+        return baseline.getvalue(), stats
+
+    if options.auto_crop:
+        img = auto_crop(img)
+    if max(img.size) > options.max_side:
+        img.thumbnail((options.max_side, options.max_side), Image.LANCZOS)
+    if options.deskew and options.max_skew_degrees > 0:
+        angle = estimate_skew(img, options.max_skew_degrees)
+        if angle:
+            img = img.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=(255, 255, 255))
+            stats["deskew_degrees"] = angle
+    if options.grayscale == "always" or (
+        options.grayscale == "auto" and is_colourless(img, options.grayscale_saturation)
+    ):
+        img = img.convert("L")
+        stats["grayscale"] = True
+
+    data, quality = encode_jpeg(img, options)
+    if len(data) >= stats["original_bytes"]:
+        # Small or already compact pages: the plain encode is the better payload.
+        data, quality = baseline.getvalue(), 75
+    stats.update(
+        size=img.size,
+        quality=quality,
+        sent_bytes=len(data),
+        bytes_saved=stats["original_bytes"] - len(data),
+    )
+    return data, stats
@@ -0,0 +1,123 @@
+"""
+KYC field detection and relevance selection over OCR'd page text.
+
+The OCR tool uses it to:
+
+1. stop reading a document early, once the pages read so far show every
+   field the document type needs (``fields_found``, ``required_fields``);
+2. hand the agent only the KYC-relevant chunks of a long document instead of
+   every page (``select_relevant``), keeping the LLM context and token usage
+   small.
+
+Detection is deliberately cheap (regular expressions over a label followed
+by a plausible value, plus MRZ lines), since it runs on every page.
+"""
+import os
+import re
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+_DATE = r"\d{1,4}[./\- ]\s?(?:\d{1,2}|[A-Za-z]{3,9})[./\- ]\s?\d{2,4}"
+FIELD_PATTERNS: Dict[str, re.Pattern] = {
+    name: re.compile(pattern, re.IGNORECASE)
+    for name, pattern in {
+        "full_name": r"\b(?:full\s+name|name|surname|given\s+names?)\b\s*[:\-]?\s*[A-Za-z][A-Za-z'\-]+",
+        "date_of_birth": rf"\b(?:date\s+of\s+birth|birth\s*date|d\.?o\.?b\.?|born)\b[^\n]{{0,30}}?{_DATE}",
+        "document_number": r"\b(?:passport|document|card|licen[cs]e|id|identity)\s*(?:no\.?|number|#)[^\n]{0,20}?\b(?=[A-Z]*\d)[A-Z0-9]{5,}\b",
+        "expiry_date": rf"\b(?:expir\w*|valid\s+(?:until|thru|to))\b[^\n]{{0,30}}?{_DATE}",
+        "issue_date": rf"\b(?:date\s+of\s+issue|issued?(?:\s+on)?)\b[^\n]{{0,30}}?{_DATE}",
+        "nationality": r"\b(?:nationality|citizenship)\b\s*[:\-]?\s*[A-Za-z]{3,}",
+        "address": r"\b(?:address|street|road|avenue|postcode|post\s+code|zip)\b[^\n]{0,60}?\d",
+    }.items()
+}
+# An ICAO machine-readable zone carries the name, birth date, document number,
+# nationality and expiry on its own.
+MRZ_LINE = re.compile(r"^[A-Z0-9<]{30,44}$", re.MULTILINE)
+MRZ_FIELDS = frozenset({"full_name", "date_of_birth", "document_number", "nationality", "expiry_date"})
+
+DEFAULT_REQUIRED: Dict[str, FrozenSet[str]] = {
+    "default": frozenset({"full_name", "date_of_birth", "document_number"}),
+    "utility_bill": frozenset({"full_name", "address"}),
+    "bank_statement": frozenset({"full_name", "address"}),
+}
+_ID_TOKEN = re.compile(r"\b(?=[A-Z]*\d)[A-Z0-9]{6,}\b")
+_DATE_TOKEN = re.compile(_DATE)
+
+
+def fields_found(text: str) -> Set[str]:
+    """KYC fields that appear (label plus value) in ``text``."""
+    found = {name for name, pattern in FIELD_PATTERNS.items() if pattern.search(text)}
+    if any("<<" in line for line in MRZ_LINE.findall(text)):
+        found |= MRZ_FIELDS
+    return found
+
+
+def required_fields(document_type: Optional[str]) -> FrozenSet[str]:
+    """Fields whose presence ends the OCR of a document early; ``OCR_REQUIRED_FIELDS`` overrides."""
+    override = os.getenv("OCR_REQUIRED_FIELDS")
+    if override is not None:
+        return frozenset(f.strip() for f in override.split(",") if f.strip())
+    return DEFAULT_REQUIRED.get((document_type or "").lower(), DEFAULT_REQUIRED["default"])
+
+
+def chunk_page(text: str, max_chars: int = 800) -> List[str]:
+    """Split a page into paragraph chunks of at most about ``max_chars``."""
+    chunks: List[str] = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        lines = paragraph.splitlines() if len(paragraph) > max_chars else [paragraph]
+        for piece in lines:
+            if current and len(current) + len(piece) + 1 > max_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n{piece}" if current else piece
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def chunk_score(chunk: str) -> float:
+    """Relevance of a chunk: KYC fields it carries, then dates and ID-like tokens."""
+    return (
+        3.0 * len(fields_found(chunk))
+        + min(len(_DATE_TOKEN.findall(chunk)), 5)
+        + min(len(_ID_TOKEN.findall(chunk)), 5)
+    )
+
+
+def select_relevant(pages: List[str], budget: int) -> Tuple[str, int]:
+    """
+    Join ``pages`` (each starting with its ``--- Page n ---`` header) into the
+    tool output. If they exceed ``budget`` characters, keep the highest
+    scoring chunks that fit, in document order, under their page headers.
+    Returns the text and the number of chunks left out.
+    """
+    full = "\n\n".join(pages)
+    if budget <= 0 or len(full) <= budget:
+        return full, 0
+
+    candidates = []  # (score, page index, chunk index, chunk)
+    headers = []
+    for p, page in enumerate(pages):
+        header, _, body = page.partition("\n")
+        headers.append(header)
+        for c, chunk in enumerate(chunk_page(body)):
+            candidates.append((chunk_score(chunk), p, c, chunk))
+
+    selected: Dict[int, List[Tuple[int, str]]] = {}
+    used = 0
+    for score, p, c, chunk in sorted(candidates, key=lambda item: (-item[0], item[1], item[2])):
+        if score <= 0:
+            break
+        cost = len(chunk) + (0 if p in selected else len(headers[p]) + 2)
+        if used + cost > budget:
+            continue
+        selected.setdefault(p, []).append((c, chunk))
+        used += cost
+
+    if not selected:
+        return full[:budget], len(candidates)
+    parts = []
+    for p in sorted(selected):
+        parts.append("\n".join([headers[p]] + [chunk for _, chunk in sorted(selected[p])]))
+    kept = sum(len(chunks) for chunks in selected.values())
+    return "\n\n".join(parts), len(candidates) - kept